@@ -0,0 +1,122 @@
+"""
+Asyncio serving mode for the sales team chat.
+
+Serves the same routes and server-sent events as multi_agents.py, but every
+/chat stream is a coroutine rather than a worker thread: the model and
+Tavily calls are awaited, so hundreds of open streams share one process.
+When a client disconnects, Quart cancels the stream and with it the
+in-flight OpenAI or Tavily request.
+
+Run it with `python async_server.py`, or behind hypercorn:
+    hypercorn async_server:app --bind 0.0.0.0:5000
+Both come with `pip install -r requirements.txt`.
+"""
+import asyncio
+import json
+import os
+
+from quart import Quart, Response, jsonify, render_template, request
+from tavily import AsyncTavilyClient
+
+from async_swarm import AsyncSwarm
+from multi_agents import (
+    SESSION_COOKIE,
+    SESSION_HEADER,
+    TOOL_WORKERS,
+    TurnStream,
+    agent_map,
+    logger,
+    search_cache,
+    search_query,
+    sessions,
+)
+
+async_tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+
+
+async def web_search(query, time_period="day"):
+    responses = await search_cache.aget_or_search(
+        query, time_period,
+        lambda: async_tavily_client.search(search_query(query, time_period), search_depth="advanced"),
+    )
+    logger.info(search_cache.report())
+    # JSON, so converse can read the results back from the tool message
+    return json.dumps(responses)
+
+
+# The Researcher's web_search runs through the async Tavily client instead of blocking the loop
+client = AsyncSwarm(overrides={"web_search": web_search}, max_workers=TOOL_WORKERS)
+logger.info("Async Swarm client initialized")
+
+app = Quart(__name__)
+
+
+def event(payload):
+    return ("data: " + json.dumps(payload) + "\n\n").encode("utf-8")
+
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+
+@app.route('/stats')
+async def stats():
+    return jsonify(sessions=sessions.stats(), search_cache=search_cache.stats(), tool_calls=client.tool_stats.stats())
+
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    user_input = (await request.get_json())['message']
+    print(f"Initial user input received: {user_input}")
+    session = sessions.get(request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE))
+
+    async def generate():
+        async with session.async_lock:
+            try:
+                async for data in converse(session, user_input):
+                    yield data
+            except asyncio.CancelledError:
+                logger.info(f"Client disconnected, cancelled session {session.id}")
+                raise
+            finally:
+                sessions.save(session)
+
+    response = Response(generate(), content_type='text/event-stream')
+    response.headers[SESSION_HEADER] = session.id
+    response.set_cookie(SESSION_COOKIE, session.id, max_age=sessions.ttl, httponly=True, samesite='Lax')
+    # Conversations can outlast Quart's default 60 second response timeout
+    response.timeout = None
+    return response
+
+
+async def converse(session, user_input):
+    conversation_history = session.history
+    current_agent = session.current_agent
+    try:
+        print(f"Running {current_agent}...")
+        yield event({"role": "system", "content": f"{current_agent} is thinking..."})
+
+        conversation_history.append({"role": "user", "content": user_input})
+        stream = TurnStream(current_agent)
+        async for chunk in client.run_and_stream(
+            agent=agent_map[current_agent],
+            messages=conversation_history,
+        ):
+            for payload in stream.feed(chunk):
+                yield event(payload)
+
+        events, current_agent = stream.finish(current_agent, conversation_history)
+        for payload in events:
+            yield event(payload)
+
+        session.current_agent = current_agent
+
+    except Exception as e:
+        error_message = f"An error occurred: {str(e)}"
+        logger.exception(f"Error: {error_message}")
+        yield event({"role": "system", "content": error_message})
+
+
+if __name__ == '__main__':
+    app.run(host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,155 @@
+import asyncio
+import copy
+import inspect
+import json
+import logging
+import time
+from collections import defaultdict
+from functools import partial
+
+from openai import AsyncOpenAI
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+from swarm.types import Response
+from swarm.util import merge_chunk
+
+from concurrent_swarm import ConcurrentSwarm
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSwarm(ConcurrentSwarm):
+    """
+    Swarm client whose run loop awaits the model instead of blocking a thread.
+
+    Completions go through AsyncOpenAI, coroutine tools are awaited and plain
+    tools run on the bounded tool pool, so one event loop can drive hundreds
+    of conversations. As in ConcurrentSwarm, all tool calls of a turn run at
+    once and their results come back in call order. Cancelling the task
+    running run() abandons the in-flight HTTP request to OpenAI rather than
+    letting it finish unread.
+
+    Args:
+        client: AsyncOpenAI client, created from the environment if omitted
+        overrides: Optional {tool name: async function} replacing an agent's
+            blocking tool, e.g. an async web_search, without redefining the agent
+        max_workers: Tool calls running at once, across all conversations
+    """
+
+    def __init__(self, client=None, overrides=None, max_workers=8):
+        super().__init__(client=client or AsyncOpenAI(), max_workers=max_workers)
+        self.overrides = overrides or {}
+        self.tool_slots = asyncio.Semaphore(max_workers)
+
+    async def call_tool(self, call):
+        if call is None:
+            return None
+        func, args = call
+        async with self.tool_slots:
+            started = time.perf_counter()
+            if inspect.iscoroutinefunction(func):
+                result = await func(**args)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, **args))
+            return result, time.perf_counter() - started
+
+    async def handle_tool_calls(self, tool_calls, functions, context_variables, debug):
+        function_map = {f.__name__: self.overrides.get(f.__name__, f) for f in functions}
+        resolved = [self.resolve_tool(tool_call, function_map, context_variables) for tool_call in tool_calls]
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(self.call_tool(call) for call in resolved))
+        self.record_tool_latencies(tool_calls, outcomes, time.perf_counter() - started)
+
+        return self.merge_tool_results(tool_calls, outcomes, debug)
+
+    async def run(self, agent, messages, context_variables=None, model_override=None, debug=False,
+                  max_turns=float("inf"), execute_tools=True):
+        """Same loop and Response as Swarm.run, without streaming."""
+        active_agent = agent
+        context_variables = copy.deepcopy(context_variables or {})
+        history = copy.deepcopy(messages)
+        init_len = len(messages)
+
+        while len(history) - init_len < max_turns and active_agent:
+            # get_chat_completion hands back the AsyncOpenAI coroutine
+            completion = await self.get_chat_completion(
+                agent=active_agent,
+                history=history,
+                context_variables=context_variables,
+                model_override=model_override,
+                stream=False,
+                debug=debug,
+            )
+            message = completion.choices[0].message
+            message.sender = active_agent.name
+            history.append(json.loads(message.model_dump_json()))
+
+            if not message.tool_calls or not execute_tools:
+                break
+
+            partial_response = await self.handle_tool_calls(message.tool_calls, active_agent.functions, context_variables, debug)
+            history.extend(partial_response.messages)
+            context_variables.update(partial_response.context_variables)
+            if partial_response.agent:
+                active_agent = partial_response.agent
+
+        return Response(messages=history[init_len:], agent=active_agent, context_variables=context_variables)
+
+    async def run_and_stream(self, agent, messages, context_variables=None, model_override=None, debug=False,
+                             max_turns=float("inf"), execute_tools=True):
+        """
+        Async generator with the same chunks as Swarm.run_and_stream: a start
+        and end delimiter around each completion's deltas, then {"response": Response}.
+        """
+        active_agent = agent
+        context_variables = copy.deepcopy(context_variables or {})
+        history = copy.deepcopy(messages)
+        init_len = len(messages)
+
+        while len(history) - init_len < max_turns:
+            message = {
+                "content": "",
+                "sender": active_agent.name,
+                "role": "assistant",
+                "function_call": None,
+                "tool_calls": defaultdict(lambda: {"function": {"arguments": "", "name": ""}, "id": "", "type": ""}),
+            }
+            completion = await self.get_chat_completion(
+                agent=active_agent,
+                history=history,
+                context_variables=context_variables,
+                model_override=model_override,
+                stream=True,
+                debug=debug,
+            )
+            yield {"delim": "start"}
+            async for chunk in completion:
+                delta = json.loads(chunk.choices[0].delta.model_dump_json())
+                if delta["role"] == "assistant":
+                    delta["sender"] = active_agent.name
+                yield delta
+                delta.pop("role", None)
+                delta.pop("sender", None)
+                merge_chunk(message, delta)
+            yield {"delim": "end"}
+
+            message["tool_calls"] = list(message.get("tool_calls", {}).values()) or None
+            history.append(message)
+            if not message["tool_calls"] or not execute_tools:
+                break
+
+            tool_calls = [
+                ChatCompletionMessageToolCall(
+                    id=tool_call["id"],
+                    function=Function(arguments=tool_call["function"]["arguments"], name=tool_call["function"]["name"]),
+                    type=tool_call["type"],
+                )
+                for tool_call in message["tool_calls"]
+            ]
+            partial_response = await self.handle_tool_calls(tool_calls, active_agent.functions, context_variables, debug)
+            history.extend(partial_response.messages)
+            context_variables.update(partial_response.context_variables)
+            if partial_response.agent:
+                active_agent = partial_response.agent
+
+        yield {"response": Response(messages=history[init_len:], agent=active_agent, context_variables=context_variables)}
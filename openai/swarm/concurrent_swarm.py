@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from swarm import Swarm
+from swarm.core import __CTX_VARS_NAME__
+from swarm.types import Response
+
+logger = logging.getLogger(__name__)
+
+
+class ToolStats:
+    """
+    Per-tool latency, and how much wall-clock time running a turn's tool calls
+    concurrently saved compared with running them one after another.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tools = {}
+        self.batches = 0
+        self.concurrent_batches = 0
+        self.serial_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def record(self, latencies, wall_seconds):
+        """
+        Args:
+            latencies: (tool name, seconds) of every call in one assistant turn
+            wall_seconds: Time from dispatching the first call to the last result
+        """
+        with self._lock:
+            for name, seconds in latencies:
+                tool = self.tools.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+                tool["calls"] += 1
+                tool["seconds"] += seconds
+                tool["max_seconds"] = max(tool["max_seconds"], seconds)
+            self.batches += 1
+            self.concurrent_batches += len(latencies) > 1
+            self.serial_seconds += sum(seconds for _, seconds in latencies)
+            self.wall_seconds += wall_seconds
+
+    @property
+    def saved_seconds(self):
+        return max(self.serial_seconds - self.wall_seconds, 0.0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tools": {
+                    name: {
+                        "calls": tool["calls"],
+                        "avg_ms": round(tool["seconds"] / tool["calls"] * 1000, 1),
+                        "max_ms": round(tool["max_seconds"] * 1000, 1),
+                    }
+                    for name, tool in self.tools.items()
+                },
+                "turns": self.batches,
+                "concurrent_turns": self.concurrent_batches,
+                "serial_seconds": round(self.serial_seconds, 3),
+                "wall_seconds": round(self.wall_seconds, 3),
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+class ConcurrentSwarm(Swarm):
+    """
+    Swarm client that runs all tool calls of an assistant turn at the same time.
+
+    Swarm executes a turn's tool calls one after another, so a model asking for
+    three web searches waits for the sum of their latencies. Here they are
+    dispatched together on a shared, bounded thread pool and their results
+    handed back to the model in call order, so the turn takes as long as its
+    slowest call. A transfer still goes to the last agent returned, as in Swarm.
+
+    Args:
+        client: OpenAI client, created from the environment if omitted
+        max_workers: Tool calls running at once, across all conversations
+    """
+
+    def __init__(self, client=None, max_workers=8):
+        super().__init__(client=client)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="swarm-tool")
+        self.tool_stats = ToolStats()
+
+    def resolve_tool(self, tool_call, function_map, context_variables):
+        """Returns the function and arguments of tool_call, or None if the agent has no such tool."""
+        func = function_map.get(tool_call.function.name)
+        if func is None:
+            return None
+        args = json.loads(tool_call.function.arguments)
+        if __CTX_VARS_NAME__ in func.__code__.co_varnames:
+            args[__CTX_VARS_NAME__] = context_variables
+        return func, args
+
+    def timed_call(self, func, args):
+        started = time.perf_counter()
+        result = func(**args)
+        return result, time.perf_counter() - started
+
+    def merge_tool_results(self, tool_calls, outcomes, debug):
+        """
+        Builds Swarm's partial Response from (raw result, seconds) per tool
+        call, None for unknown tools, in the order the model made the calls.
+        """
+        partial_response = Response(messages=[], agent=None, context_variables={})
+        for tool_call, outcome in zip(tool_calls, outcomes):
+            name = tool_call.function.name
+            if outcome is None:
+                partial_response.messages.append(
+                    {"role": "tool", "tool_call_id": tool_call.id, "tool_name": name, "content": f"Error: Tool {name} not found."}
+                )
+                continue
+            result = self.handle_function_result(outcome[0], debug)
+            partial_response.messages.append(
+                {"role": "tool", "tool_call_id": tool_call.id, "tool_name": name, "content": result.value}
+            )
+            partial_response.context_variables.update(result.context_variables)
+            if result.agent:
+                partial_response.agent = result.agent
+        return partial_response
+
+    def record_tool_latencies(self, tool_calls, outcomes, wall_seconds):
+        latencies = [(tool_call.function.name, outcome[1]) for tool_call, outcome in zip(tool_calls, outcomes) if outcome]
+        if not latencies:
+            return
+        self.tool_stats.record(latencies, wall_seconds)
+        if len(latencies) > 1:
+            serial = sum(seconds for _, seconds in latencies)
+            logger.info(
+                f"Ran {len(latencies)} tool calls in {wall_seconds * 1000:.0f}ms "
+                f"({serial * 1000:.0f}ms one after another): "
+                + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in latencies)
+            )
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug):
+        function_map = {f.__name__: f for f in functions}
+        resolved = [self.resolve_tool(tool_call, function_map, context_variables) for tool_call in tool_calls]
+
+        started = time.perf_counter()
+        if len(tool_calls) == 1:
+            # Nothing to overlap, skip the hop to the pool
+            outcomes = [self.timed_call(*resolved[0]) if resolved[0] else None]
+        else:
+            futures = [self.executor.submit(self.timed_call, *call) if call else None for call in resolved]
+            outcomes = [future.result() if future else None for future in futures]
+        self.record_tool_latencies(tool_calls, outcomes, time.perf_counter() - started)
+
+        return self.merge_tool_results(tool_calls, outcomes, debug)
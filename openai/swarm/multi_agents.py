@@ -1,7 +1,8 @@
 from flask import Flask, request, jsonify, render_template, stream_with_context, Response
 from functools import wraps
 from flask_cors import CORS
-from swarm import Swarm, Agent
+from swarm import Agent
+from concurrent_swarm import ConcurrentSwarm
 from dotenv import load_dotenv
 import os
 from tavily import TavilyClient
@@ -9,6 +10,10 @@ import logging
 from datetime import datetime
 import markdown
 import json
+import re
+import time
+from search_cache import SearchCache
+from session_store import SessionStore
 
 # Add these color codes at the beginning of the file, after the imports
 BLUE = "\033[94m"
@@ -28,13 +33,30 @@ load_dotenv()
 logger.info("Environment variables loaded")
 
 # Initialize Swarm client with potential configuration from environment variable
-client = Swarm()
+# Tool calls of one turn run concurrently, at most TOOL_WORKERS at a time across all sessions
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+client = ConcurrentSwarm(max_workers=TOOL_WORKERS)
 logger.info("Swarm client initialized")
 
 # Initialize Tavily client
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 logger.info("Tavily client initialized")
 
+# Conversations and the active agent live server-side, keyed by a session ID cookie or header
+SESSION_COOKIE = "session_id"
+SESSION_HEADER = "X-Session-ID"
+sessions = SessionStore(
+    max_sessions=int(os.getenv("MAX_SESSIONS", "10000")),
+    ttl=int(os.getenv("SESSION_TTL", "1800")),
+    max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "4000")),
+    max_bytes=int(os.getenv("SESSION_MAX_MB", "256")) * 1024 * 1024,
+)
+logger.info("Session store initialized")
+
+# Identical searches from any session share one cached, coalesced Tavily call
+search_cache = SearchCache(maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1024")))
+logger.info("Search cache initialized")
+
 # ===== Helper Functions =====
 def transfer_to_agent(agent_name):
     agent_map = {
@@ -49,7 +71,7 @@ def transfer_to_agent(agent_name):
         print(f"\n[System] Transferring to {agent_name}")
     return agent
 
-def web_search(query, time_period="day"):
+def search_query(query, time_period="day"):
     current_year = current_date.year
     time_phrase = {
         "day": f"in the last 24 hours (current date: {current_date.strftime('%Y-%m-%d')})",
@@ -63,11 +85,18 @@ def web_search(query, time_period="day"):
     print(f"\n[System] Performing web search:")
     print(f"Query: '{modified_query}'")
     print(f"Time period: {time_period}")
+    return modified_query
 
-    responses = tavily_client.search(modified_query, search_depth="advanced")
+def web_search(query, time_period="day"):
+    responses = search_cache.get_or_search(
+        query, time_period,
+        lambda: tavily_client.search(search_query(query, time_period), search_depth="advanced"),
+    )
+    logger.info(search_cache.report())
     # print(f"Search results: {responses}")
 
-    return responses
+    # JSON, so the chat loop can read the results back from the tool message
+    return json.dumps(responses)
 
 # ===== Agent Definitions =====
 # Define the sales team agents
@@ -207,6 +236,215 @@ researcher_agent = Agent(
 )
 logger.info("Researcher agent created")
 
+agent_map = {
+    "Sales Manager": manager_agent,
+    "Lead Qualifier": lead_qualifier_agent,
+    "Objection Handler": objection_handler_agent,
+    "Closer": closer_agent,
+    "Researcher": researcher_agent
+}
+
+# ===== Response Helpers =====
+# Shared by the Flask app below and the asyncio server in async_server.py
+def split_transfer_block(content):
+    """
+    Looks for a ```json {"agent_name": ...}``` block the model wrote instead of
+    calling transfer_to_agent. Returns the content without the block and the
+    agent to transfer to, or the content unchanged and None.
+    """
+    # Check if the content contains a JSON block
+    json_start = content.find('```json')
+    if json_start != -1:
+        json_end = content.find('```', json_start + 7)
+        if json_end != -1:
+            json_str = content[json_start + 7:json_end].strip()
+            try:
+                function_args = json.loads(json_str)
+                if 'agent_name' in function_args:
+                    new_agent = function_args['agent_name']
+                    if new_agent in agent_map:
+                        return content[:json_start].strip(), new_agent
+            except json.JSONDecodeError:
+                print(f"Failed to parse JSON: {json_str}")
+    return content, None
+
+def summarize_search_results(query, search_results):
+    result_summary = f"Here's what I found about {query}:\n\n"
+    if isinstance(search_results, str):
+        # The content of a web_search tool message
+        try:
+            search_results = json.loads(search_results)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(search_results, dict):
+        # Tavily's response, the hits are under "results"
+        search_results = search_results.get('results', [])
+    if isinstance(search_results, list):
+        for result in search_results:
+            if isinstance(result, dict):
+                title = result.get('title', 'No title')
+                snippet = result.get('snippet') or result.get('content') or 'No snippet available'
+                result_summary += f"- {title}: {snippet}\n"
+            elif isinstance(result, str):
+                result_summary += f"- {result}\n"
+    elif isinstance(search_results, str):
+        result_summary += search_results
+    return result_summary
+
+# Matches the agent_name argument only once its closing quote has streamed in
+TRANSFER_ARGUMENT = re.compile(r'"agent_name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def partial_agent_name(arguments):
+    """Agent name from transfer_to_agent arguments that may still be arriving, or None."""
+    match = TRANSFER_ARGUMENT.search(arguments)
+    return json.loads(f'"{match.group(1)}"') if match else None
+
+class TurnStream:
+    """
+    Turns the chunks of client.run(..., stream=True) into SSE payloads.
+
+    Content deltas become {"role": "assistant", "name", "id", "delta"} events as
+    they arrive, where id numbers the assistant messages of the request so the
+    page can replace the streamed text with the final message of the same id.
+    Tool-call argument deltas are merged per call, and a transfer_to_agent
+    call is announced as soon as its agent_name is complete rather than when
+    the run ends. The time to first token of every model turn is logged.
+    Once the run is over, finish() turns its response into the final events.
+    """
+
+    def __init__(self, agent_name):
+        self.sender = agent_name
+        self.messages = 0
+        self.streamed = set()
+        self.transfers = {}
+        self.tool_calls = {}
+        self.turn_started = None
+        self.waiting = False
+        self.response = None
+
+    def feed(self, chunk):
+        events = []
+        if chunk.get("delim") == "start":
+            self.messages += 1
+            self.tool_calls = {}
+            self.turn_started = time.perf_counter()
+            self.waiting = True
+        elif chunk.get("delim") == "end":
+            events += self.announce_transfer()
+        elif "response" in chunk:
+            self.response = chunk["response"]
+        else:
+            self.sender = chunk.get("sender") or self.sender
+            content = chunk.get("content")
+            tool_calls = chunk.get("tool_calls") or []
+            if self.waiting and (content or tool_calls):
+                self.waiting = False
+                logger.info(f"{self.sender} time to first token: {(time.perf_counter() - self.turn_started) * 1000:.0f}ms")
+            if content:
+                self.streamed.add(self.messages)
+                events.append({"role": "assistant", "name": self.sender, "id": self.messages, "delta": content})
+            for call in tool_calls:
+                merged = self.tool_calls.setdefault(call.get("index", 0), {"name": "", "arguments": ""})
+                function = call.get("function") or {}
+                merged["name"] += function.get("name") or ""
+                merged["arguments"] += function.get("arguments") or ""
+            if tool_calls:
+                events += self.announce_transfer()
+        return events
+
+    def finish(self, current_agent, conversation_history):
+        """
+        Processes the turn's final response once the stream is over.
+
+        Adds the assistant messages and search summaries to the history and
+        follows the turn's transfers. Shared by the Flask and asyncio servers.
+
+        Returns:
+            tuple: (list of SSE payloads, agent handling the conversation next)
+        """
+        print(f"{current_agent} response received: {self.response}")
+        if self.response is None or not hasattr(self.response, 'messages'):
+            raise ValueError(f"Invalid response from {current_agent}")
+
+        print("Processing messages...")
+        events = []
+        message_number = 0
+        searches = {}
+        searched = set()
+        back_to_manager = False
+        for message in self.response.messages:
+            if message.get('role') == 'tool':
+                # The searches already ran during the turn, summarize what they returned
+                search = searches.pop(message.get('tool_call_id'), None)
+                if search is None:
+                    continue
+                result_summary = summarize_search_results(search[0], message.get('content'))
+                events.append({"role": "assistant", "name": "Researcher", "content": result_summary})
+                conversation_history.append({"role": "assistant", "content": result_summary})
+                back_to_manager = True
+                continue
+
+            if message.get('role') == 'assistant':
+                message_number += 1
+                content = message.get('content', '')
+                if isinstance(content, str):
+                    content, new_agent = split_transfer_block(content)
+                    if new_agent:
+                        current_agent = new_agent
+                        back_to_manager = False
+                        events.append({"role": "system", "content": f"Transferring to {current_agent}..."})
+
+                # The final text replaces the streamed deltas of the same message on the page
+                if content and content.lower() != 'none':
+                    print(f"Yielding message: role=assistant, name={current_agent}, content={content[:50]}...")
+                    events.append({"role": "assistant", "name": current_agent, "content": content, "id": message_number})
+                    conversation_history.append({"role": "assistant", "content": content})
+                elif message_number in self.streamed:
+                    events.append({"role": "assistant", "name": current_agent, "content": "", "id": message_number})
+
+            # Every call of the turn, the model may ask for several searches at once
+            function_calls = [(None, message['function_call'])] if message.get('function_call') else [(tool_call.get('id'), tool_call['function']) for tool_call in message.get('tool_calls') or []]
+            for call_id, function_call in function_calls:
+                function_name = function_call.get('name')
+                function_args = json.loads(function_call.get('arguments', '{}'))
+                print(f"Function call detected: {function_name}, args: {function_args}")
+
+                if function_name == 'transfer_to_agent':
+                    new_agent = function_args.get('agent_name')
+                    if new_agent in agent_map:
+                        current_agent = new_agent
+                        back_to_manager = False
+                        print(f"Transferring to {current_agent}")
+                        # Usually already announced while the call was streaming
+                        if self.transfers.get(message_number) != new_agent:
+                            events.append({"role": "system", "content": f"Transferring to {current_agent}..."})
+                elif function_name == 'web_search':
+                    query = function_args.get('query')
+                    time_period = function_args.get('time_period', 'day')
+                    if (query, time_period) in searched:
+                        # Asked twice in one turn, shown and summarized once
+                        continue
+                    searched.add((query, time_period))
+                    events.append({"role": "assistant", "name": "Researcher", "content": f"Searching for: {query} (Time period: {time_period})"})
+                    searches[call_id] = (query, time_period)
+
+        # Transfer back to Sales Manager once the searches are in, unless the turn handed off since
+        if back_to_manager:
+            current_agent = "Sales Manager"
+            events.append({"role": "system", "content": "Transferring back to Sales Manager..."})
+        return events, current_agent
+
+    def announce_transfer(self):
+        if self.messages in self.transfers:
+            return []
+        for call in self.tool_calls.values():
+            if call["name"] == "transfer_to_agent":
+                new_agent = partial_agent_name(call["arguments"])
+                if new_agent in agent_map:
+                    self.transfers[self.messages] = new_agent
+                    return [{"role": "system", "content": f"Transferring to {new_agent}..."}]
+        return []
+
 # Update the Flask setup
 app = Flask(__name__)
 
@@ -214,23 +452,27 @@ app = Flask(__name__)
 def index():
     return render_template('index.html')
 
+@app.route('/stats')
+def stats():
+    return jsonify(sessions=sessions.stats(), search_cache=search_cache.stats(), tool_calls=client.tool_stats.stats())
+
 @app.route('/chat', methods=['POST'])
 def chat():
     initial_input = request.json['message']
     print(f"Initial user input received: {initial_input}")
+    session = sessions.get(request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE))
 
     def generate():
+        # Requests from the same session are handled one at a time so their histories don't interleave
+        session.lock.acquire()
+        try:
+            yield from converse(session.history, session.current_agent)
+        finally:
+            sessions.save(session)
+            session.lock.release()
+
+    def converse(conversation_history, current_agent):
         user_input = initial_input
-        conversation_history = []
-        current_agent = "Sales Manager"
-
-        agent_map = {
-            "Sales Manager": manager_agent,
-            "Lead Qualifier": lead_qualifier_agent,
-            "Objection Handler": objection_handler_agent,
-            "Closer": closer_agent,
-            "Researcher": researcher_agent
-        }
 
         while True:
             try:
@@ -238,82 +480,20 @@ def chat():
                 yield "data: " + json.dumps({"role": "system", "content": f"{current_agent} is thinking..."}) + "\n\n"
 
                 conversation_history.append({"role": "user", "content": user_input})
-                agent_response = client.run(
+                stream = TurnStream(current_agent)
+                for chunk in client.run(
                     agent=agent_map[current_agent],
                     messages=conversation_history,
-                )
-
-                print(f"{current_agent} response received: {agent_response}")
-                if agent_response is None or not hasattr(agent_response, 'messages'):
-                    raise ValueError(f"Invalid response from {current_agent}")
-
-                print("Processing messages...")
-                for message in agent_response.messages:
-                    if message.get('role') == 'assistant':
-                        content = message.get('content', '')
-                        if isinstance(content, str):
-                            # Check if the content contains a JSON block
-                            json_start = content.find('```json')
-                            if json_start != -1:
-                                json_end = content.find('```', json_start + 7)
-                                if json_end != -1:
-                                    json_str = content[json_start + 7:json_end].strip()
-                                    try:
-                                        function_args = json.loads(json_str)
-                                        if 'agent_name' in function_args:
-                                            new_agent = function_args['agent_name']
-                                            if new_agent in agent_map:
-                                                current_agent = new_agent
-                                                content = content[:json_start].strip()
-                                                yield "data: " + json.dumps({"role": "system", "content": f"Transferring to {current_agent}..."}) + "\n\n"
-                                    except json.JSONDecodeError:
-                                        print(f"Failed to parse JSON: {json_str}")
-
-                        if content and content.lower() != 'none':
-                            print(f"Yielding message: role=assistant, name={current_agent}, content={content[:50]}...")
-                            yield "data: " + json.dumps({"role": "assistant", "name": current_agent, "content": content}) + "\n\n"
-                            conversation_history.append({"role": "assistant", "content": content})
-
-                    function_call = message.get('function_call') or (message.get('tool_calls') and message['tool_calls'][0]['function'])
-                    if function_call:
-                        function_name = function_call.get('name')
-                        function_args = json.loads(function_call.get('arguments', '{}'))
-                        print(f"Function call detected: {function_name}, args: {function_args}")
-
-                        if function_name == 'transfer_to_agent':
-                            new_agent = function_args.get('agent_name')
-                            if new_agent in agent_map:
-                                current_agent = new_agent
-                                print(f"Transferring to {current_agent}")
-                                yield "data: " + json.dumps({"role": "system", "content": f"Transferring to {current_agent}..."}) + "\n\n"
-                        elif function_name == 'web_search':
-                            query = function_args.get('query')
-                            time_period = function_args.get('time_period', 'day')
-                            yield "data: " + json.dumps({"role": "assistant", "name": "Researcher", "content": f"Searching for: {query} (Time period: {time_period})"}) + "\n\n"
-
-                            # Perform the actual web search
-                            search_results = web_search(query, time_period)
-
-                            # Process and yield the search results
-                            result_summary = f"Here's what I found about {query}:\n\n"
-                            if isinstance(search_results, list):
-                                for result in search_results:
-                                    if isinstance(result, dict):
-                                        title = result.get('title', 'No title')
-                                        snippet = result.get('snippet', 'No snippet available')
-                                        result_summary += f"- {title}: {snippet}\n"
-                                    elif isinstance(result, str):
-                                        result_summary += f"- {result}\n"
-                            elif isinstance(search_results, str):
-                                result_summary += search_results
-
-                            yield "data: " + json.dumps({"role": "assistant", "name": "Researcher", "content": result_summary}) + "\n\n"
-                            conversation_history.append({"role": "assistant", "content": result_summary})
-
-                            # Transfer back to Sales Manager
-                            current_agent = "Sales Manager"
-                            yield "data: " + json.dumps({"role": "system", "content": "Transferring back to Sales Manager..."}) + "\n\n"
+                    stream=True,
+                ):
+                    for payload in stream.feed(chunk):
+                        yield "data: " + json.dumps(payload) + "\n\n"
+
+                events, current_agent = stream.finish(current_agent, conversation_history)
+                for payload in events:
+                    yield "data: " + json.dumps(payload) + "\n\n"
 
+                session.current_agent = current_agent
                 break  # Exit the generator to wait for the next user input
 
             except Exception as e:
@@ -325,7 +505,10 @@ def chat():
                 yield "data: " + json.dumps({"role": "system", "content": error_message}) + "\n\n"
                 break
 
-    return Response(stream_with_context(generate()), content_type='text/event-stream')
+    response = Response(stream_with_context(generate()), content_type='text/event-stream')
+    response.headers[SESSION_HEADER] = session.id
+    response.set_cookie(SESSION_COOKIE, session.id, max_age=sessions.ttl, httponly=True, samesite='Lax')
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
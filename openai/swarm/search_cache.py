@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# How long results stay fresh for each web_search time_period, in seconds.
+# A "day" search is about breaking news; a "year" search barely changes within a day.
+SEARCH_TTLS = {
+    "day": 10 * 60,
+    "week": 60 * 60,
+    "month": 6 * 60 * 60,
+    "year": 24 * 60 * 60,
+}
+DEFAULT_TTL = 10 * 60
+
+
+def search_key(query, time_period):
+    return " ".join(query.lower().split()), (time_period or "day").lower()
+
+
+class SearchCache:
+    """
+    TTL cache for web search results that coalesces identical searches.
+
+    Results are keyed by the normalized (query, time_period) and expire after
+    the period's TTL. While a search is in flight, identical requests wait for
+    it instead of starting their own, so concurrent sessions asking the same
+    thing pay for one upstream call. Failed searches are not cached, and their
+    error is raised to every waiting caller.
+
+    Args:
+        maxsize: Maximum number of cached results, least recently used are dropped first
+        ttls: {time_period: seconds}, periods not listed use DEFAULT_TTL
+    """
+
+    def __init__(self, maxsize=1024, ttls=None):
+        self.maxsize = maxsize
+        self.ttls = ttls or SEARCH_TTLS
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_seconds = 0.0
+        self.upstream_seconds = 0.0
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, latency, expires = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += latency
+        return entry
+
+    def _store(self, key, result, latency):
+        self.upstream_seconds += latency
+        self._entries[key] = (result, latency, time.monotonic() + self.ttls.get(key[1], DEFAULT_TTL))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _coalesced(self, key, waited):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.coalesced += 1
+            # The caller was spared the part of the upstream call it did not wait for
+            self.saved_seconds += max(entry[1] - waited, 0.0)
+
+    def get_or_search(self, query, time_period, search):
+        """
+        Returns the cached result for (query, time_period), or calls search()
+        once for all threads asking for it at the same time.
+        """
+        key = search_key(query, time_period)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+
+        if not leader:
+            started = time.perf_counter()
+            result = future.result()
+            with self._lock:
+                self._coalesced(key, time.perf_counter() - started)
+            return result
+
+        started = time.perf_counter()
+        try:
+            result = search()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, result, time.perf_counter() - started)
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    async def aget_or_search(self, query, time_period, search):
+        """
+        Async get_or_search, where search() returns an awaitable.
+
+        The upstream call runs as its own task and callers await it shielded,
+        so one client disconnecting does not cancel the search for the others;
+        a search nobody waits for any more still completes and fills the cache.
+        """
+        key = search_key(query, time_period)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            task = self._in_flight.get(key)
+            leader = task is None
+            if leader:
+                task = self._in_flight[key] = asyncio.ensure_future(self._search_task(key, search))
+                self.misses += 1
+
+        started = time.perf_counter()
+        result = await asyncio.shield(task)
+        if not leader:
+            with self._lock:
+                self._coalesced(key, time.perf_counter() - started)
+        return result
+
+    async def _search_task(self, key, search):
+        started = time.perf_counter()
+        try:
+            result = await search()
+        except BaseException:
+            with self._lock:
+                del self._in_flight[key]
+            raise
+        with self._lock:
+            self._store(key, result, time.perf_counter() - started)
+            del self._in_flight[key]
+        return result
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hit_rate,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "upstream_seconds": round(self.upstream_seconds, 3),
+            }
+
+    def report(self):
+        stats = self.stats()
+        return (
+            f"Search cache: {stats['hits']} hits, {stats['coalesced']} coalesced, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} served without a new search), {stats['saved_seconds']:.1f}s of search latency saved"
+        )
@@ -0,0 +1,168 @@
+import asyncio
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # Without tiktoken (or its encoding files) fall back to roughly four characters per token
+    _encoding = None
+
+# Rough per-message overhead of the chat format, in tokens and in bytes of Python objects
+MESSAGE_TOKEN_OVERHEAD = 4
+MESSAGE_BYTE_OVERHEAD = 200
+
+# Session IDs are only ever minted here, as uuid4().hex
+SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def count_tokens(message):
+    content = message.get("content") or ""
+    if _encoding is not None:
+        return len(_encoding.encode(content)) + MESSAGE_TOKEN_OVERHEAD
+    return len(content) // 4 + MESSAGE_TOKEN_OVERHEAD
+
+
+class Session:
+    """
+    One sales conversation: its history, the agent currently handling it and
+    a lock so two requests from the same browser are handled one after the other
+    (async_lock under the asyncio server, where blocking on lock would stall the loop).
+    """
+
+    def __init__(self, session_id, agent):
+        self.id = session_id
+        self.history = []
+        self.current_agent = agent
+        self.last_seen = time.monotonic()
+        self.tokens = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.async_lock = asyncio.Lock()
+
+
+class SessionStore:
+    """
+    In-process session store with LRU and TTL eviction and a memory cap.
+
+    Sessions are kept in least recently used order, so expired sessions are
+    always at the front and eviction never scans the whole store. Every saved
+    history is trimmed from the oldest message until it fits in max_tokens,
+    and the least recently used sessions are dropped while the store holds
+    more than max_sessions or its estimated size exceeds max_bytes.
+
+    Args:
+        max_sessions: Maximum number of live sessions
+        ttl: Seconds of inactivity after which a session is dropped
+        max_tokens: Token budget of each conversation history
+        max_bytes: Approximate memory cap over all histories
+        default_agent: Agent new sessions start with
+    """
+
+    def __init__(self, max_sessions=10000, ttl=1800, max_tokens=4000, max_bytes=256 * 1024 * 1024,
+                 default_agent="Sales Manager"):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.default_agent = default_agent
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.trimmed = 0
+
+    def get(self, session_id=None):
+        """
+        Returns the live session for session_id, or a new one when it is
+        missing, unknown, malformed or expired.
+
+        New sessions always get a freshly minted ID, never the one the client
+        sent, so a client cannot choose (or fix) the ID of a session.
+        """
+        now = time.monotonic()
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.fullmatch(session_id):
+            session_id = None
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(uuid.uuid4().hex, self.default_agent)
+                self._sessions[session.id] = session
+                self.created += 1
+                self._evict()
+            else:
+                self._sessions.move_to_end(session.id)
+            session.last_seen = now
+            return session
+
+    def save(self, session):
+        """
+        Trims the session's history to the token budget and updates its size,
+        evicting other sessions if the store is now over its memory cap.
+        """
+        tokens = [count_tokens(message) for message in session.history]
+        total = sum(tokens)
+        drop = 0
+        # Always keep the latest message, even if it alone is over budget
+        while total > self.max_tokens and drop < len(tokens) - 1:
+            total -= tokens[drop]
+            drop += 1
+        if drop:
+            del session.history[:drop]
+            self.trimmed += drop
+
+        size = sum(len((message.get("content") or "").encode("utf-8")) + MESSAGE_BYTE_OVERHEAD for message in session.history)
+        with self._lock:
+            session.tokens = total
+            session.last_seen = time.monotonic()
+            if self._sessions.get(session.id) is session:
+                self._bytes += size - session.bytes
+                self._sessions.move_to_end(session.id)
+            session.bytes = size
+            self._evict()
+
+    def pop(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.bytes
+            return session
+
+    def _expire(self, now):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen <= self.ttl:
+                break
+            self._remove(session)
+            self.expired += 1
+
+    def _evict(self):
+        # Never evict the most recently used session, it is the one being served
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._sessions.values())))
+            self.evicted += 1
+
+    def _remove(self, session):
+        del self._sessions[session.id]
+        self._bytes -= session.bytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "trimmed_messages": self.trimmed,
+            }
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from manifest import DEFAULT_MANIFEST_DIR, manifest_directory, file_generation
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers for one namespace.
+
+    Each entry keeps the question embedding and the answer. A new question
+    reuses an answer when its embedding is within `threshold` cosine similarity
+    and it was asked with the same search options.
+
+    Answers depend on what retrieval finds, not only on the chunks they cite: a
+    newly ingested chunk can change the best answer to a question. So every
+    entry belongs to one generation of the namespace, read from its chunk
+    manifest, and all entries are dropped when the manifest is written again.
+    Without a manifest no write to the namespace can be seen, so nothing is
+    cached.
+    """
+
+    def __init__(self, namespace, index_name, threshold=0.95, maxsize=256, ttl=3600, backend=None,
+                 manifest_dir=DEFAULT_MANIFEST_DIR):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.manifest_path = os.path.join(manifest_directory(index_name, backend, manifest_dir), f"{namespace}.json")
+        self._generation = None
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def _refresh(self):
+        generation = file_generation(self.manifest_path)
+        if generation != self._generation:
+            self._generation = generation
+            self.invalidated += len(self._entries)
+            self._entries.clear()
+        return generation is not None
+
+    def lookup(self, embedding, scope=None):
+        """
+        Finds a cached answer for a similar question.
+
+        Args:
+            embedding: The question embedding
+            scope: Hashable search options the answer depends on, e.g. top_k and section
+
+        Returns:
+            str or None: The cached answer, or None on a miss
+        """
+        started = time.perf_counter()
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        with self._lock:
+            if not self._refresh():
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            best_key, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if entry["expires"] <= now:
+                    del self._entries[key]
+                    continue
+                if entry["scope"] != scope:
+                    continue
+                score = float(entry["embedding"] @ query)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - started
+            return self._entries[best_key]["answer"]
+
+    def store(self, embedding, answer, scope=None, latency=None):
+        """
+        Caches an answer.
+
+        Args:
+            embedding: The question embedding
+            answer: The generated answer
+            scope: The same search options passed to lookup()
+            latency: Seconds it took to produce the answer, for the miss metrics
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if latency is not None:
+                self.miss_seconds += latency
+            if not self._refresh():
+                return
+            self._entries[self._next_id] = {
+                "embedding": vector / (np.linalg.norm(vector) or 1),
+                "answer": answer,
+                "scope": scope,
+                "expires": time.monotonic() + self.ttl,
+            }
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "invalidated": self.invalidated,
+            "avg_hit_ms": self.hit_seconds / self.hits * 1000 if self.hits else 0.0,
+            "avg_miss_ms": self.miss_seconds / self.misses * 1000 if self.misses else 0.0,
+        }
+
+    def report(self):
+        stats = self.stats()
+        print(
+            f"Answer cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['invalidated']} invalidated, avg hit {stats['avg_hit_ms']:.1f}ms, avg miss {stats['avg_miss_ms']:.0f}ms"
+        )
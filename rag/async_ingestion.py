@@ -0,0 +1,239 @@
+import asyncio
+import random
+import time
+
+from openai import AsyncOpenAI
+from ingestion import (
+    EMBEDDING_MODEL,
+    MAX_BATCH_ITEMS,
+    MAX_BATCH_TOKENS,
+    UPSERT_BATCH_SIZE,
+    batch_records,
+)
+from manifest import delete_stale
+from vector_store import flush_index
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    # OpenAI errors expose status_code, Pinecone errors expose status
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "APIConnectionError",
+        "APITimeoutError",
+    )
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.retries = 0
+
+    def record(self, seconds):
+        self.latencies.append(seconds)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self):
+        count = len(self.latencies)
+        mean = sum(self.latencies) / count if count else 0.0
+        return (
+            f"{self.name:<7} {count:>6} calls  mean {mean * 1000:8.1f}ms  "
+            f"p50 {self.percentile(50) * 1000:8.1f}ms  p95 {self.percentile(95) * 1000:8.1f}ms  "
+            f"{self.retries} retries"
+        )
+
+
+async def with_retries(stage, fn, *args, max_attempts=6, base_delay=0.5, max_delay=30.0, **kwargs):
+    """
+    Awaits fn(*args, **kwargs), retrying retryable errors with full-jitter backoff.
+
+    Args:
+        stage: StageStats to record latency and retries on
+        fn: Coroutine function to call
+        max_attempts: Attempts before the error is raised
+        base_delay: Backoff for the first retry, in seconds
+        max_delay: Upper bound on a single backoff, in seconds
+
+    Returns:
+        The result of fn
+    """
+    for attempt in range(max_attempts):
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+            stage.record(time.perf_counter() - started)
+            return result
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable(e):
+                raise
+            stage.retries += 1
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"{stage.name} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def embed_texts_async(client, texts, model=EMBEDDING_MODEL, cache=None):
+    """
+    Async counterpart of ingestion.embed_texts for an AsyncOpenAI client.
+    """
+    embeddings = [None] * len(texts)
+    if cache is not None:
+        embeddings = await asyncio.to_thread(cache.get_many, model, texts)
+
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if missing:
+        response = await client.embeddings.create(input=missing, model=model)
+        fresh = dict(zip(missing, (item.embedding for item in sorted(response.data, key=lambda item: item.index))))
+        if cache is not None:
+            await asyncio.to_thread(cache.put_many, model, missing, [fresh[text] for text in missing])
+        embeddings = [fresh[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+    return embeddings
+
+
+async def _upsert(index, vectors, namespace):
+    # The Pinecone client is synchronous, keep it off the event loop
+    return await asyncio.to_thread(index.upsert, vectors=vectors, namespace=namespace)
+
+
+async def ingest_chunks_async(client, index, records, namespace, model=EMBEDDING_MODEL,
+                              embed_concurrency=4, upsert_concurrency=4, queue_size=8,
+                              max_batch_items=MAX_BATCH_ITEMS, max_batch_tokens=MAX_BATCH_TOKENS,
+                              upsert_batch_size=UPSERT_BATCH_SIZE, cache=None, manifest=None):
+    """
+    Streams records through chunk -> embed -> upsert stages joined by bounded queues.
+
+    Each stage runs its own workers, so a slow upsert only stalls embedding
+    once the upsert queue is full.
+
+    Args:
+        client: AsyncOpenAI client
+        index: Pinecone index (anything with an upsert(vectors, namespace) method)
+        records: Iterable of (vector_id, text, metadata) tuples, consumed lazily
+        namespace: Index namespace to write to
+        model: Embedding model name
+        embed_concurrency: Embedding requests in flight at once
+        upsert_concurrency: Upsert requests in flight at once
+        queue_size: Maximum batches waiting between two stages
+        max_batch_items: Maximum texts per embeddings request
+        max_batch_tokens: Maximum estimated tokens per embeddings request
+        upsert_batch_size: Maximum vectors per upsert request
+        cache: Optional EmbeddingCache shared across runs
+        manifest: Optional ChunkManifest, unchanged chunks are skipped and
+            chunks no longer produced for a document, and the documents
+            dropped from the manifest, are deleted
+
+    Returns:
+        dict: Chunk count, elapsed seconds, chunks/sec and per-stage StageStats
+    """
+    chunk_stats = StageStats("chunk")
+    embed_stats = StageStats("embed")
+    upsert_stats = StageStats("upsert")
+    embed_queue = asyncio.Queue(maxsize=queue_size)
+    upsert_queue = asyncio.Queue(maxsize=queue_size)
+    totals = {"chunks": 0}
+    started = time.perf_counter()
+
+    if manifest is not None:
+        records = manifest.filter(records)
+
+    async def chunk_stage():
+        batches = batch_records(records, max_batch_items, max_batch_tokens)
+        while True:
+            # Chunking may read from disk, so pull each batch in a worker thread
+            batch_started = time.perf_counter()
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            chunk_stats.record(time.perf_counter() - batch_started)
+            await embed_queue.put(batch)
+        for _ in range(embed_concurrency):
+            await embed_queue.put(None)
+
+    async def embed_worker():
+        while (batch := await embed_queue.get()) is not None:
+            texts = [text for _, text, _ in batch]
+            embeddings = await with_retries(embed_stats, embed_texts_async, client, texts, model, cache)
+            vectors = [
+                (vector_id, embedding, metadata)
+                for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+            ]
+            for start in range(0, len(vectors), upsert_batch_size):
+                await upsert_queue.put(vectors[start:start + upsert_batch_size])
+
+    async def upsert_worker():
+        while (vectors := await upsert_queue.get()) is not None:
+            await with_retries(upsert_stats, _upsert, index, vectors, namespace)
+            if manifest is not None:
+                manifest.commit([vector_id for vector_id, _, _ in vectors])
+            totals["chunks"] += len(vectors)
+            print(f"Stored {totals['chunks']} chunks so far")
+
+    async def embed_stage():
+        await asyncio.gather(*(embed_worker() for _ in range(embed_concurrency)))
+        for _ in range(upsert_concurrency):
+            await upsert_queue.put(None)
+
+    tasks = [
+        asyncio.create_task(chunk_stage()),
+        asyncio.create_task(embed_stage()),
+        *(asyncio.create_task(upsert_worker()) for _ in range(upsert_concurrency)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Keep the record of what was stored, so a rerun resumes where this one stopped
+        if manifest is not None:
+            manifest.save()
+        raise
+    if manifest is not None:
+        await asyncio.to_thread(delete_stale, index, manifest, namespace)
+    await asyncio.to_thread(flush_index, index)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "chunks": totals["chunks"],
+        "elapsed": elapsed,
+        "chunks_per_sec": totals["chunks"] / elapsed if elapsed else 0.0,
+        "stages": [chunk_stats, embed_stats, upsert_stats],
+    }
+    print(f"Ingested {summary['chunks']} chunks in {elapsed:.2f}s ({summary['chunks_per_sec']:.1f} chunks/sec)")
+    for stage in summary["stages"]:
+        print(f"  {stage.summary()}")
+    if cache is not None:
+        cache.report()
+    if manifest is not None:
+        manifest.report()
+    return summary
+
+
+def run_ingestion_pipeline(records, index, namespace, **kwargs):
+    """
+    Runs ingest_chunks_async to completion with a fresh AsyncOpenAI client.
+
+    Args:
+        records: Iterable of (vector_id, text, metadata) tuples
+        index: Pinecone index
+        namespace: Index namespace to write to
+        **kwargs: Passed through to ingest_chunks_async
+
+    Returns:
+        dict: The pipeline summary
+    """
+    async def main():
+        async with AsyncOpenAI() as client:
+            return await ingest_chunks_async(client, index, records, namespace, **kwargs)
+
+    return asyncio.run(main())
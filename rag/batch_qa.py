@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from openai import AsyncOpenAI
+from async_ingestion import StageStats, embed_texts_async, with_retries
+from embedding_cache import normalize_text
+from ingestion import EMBEDDING_MODEL, MAX_BATCH_ITEMS, MAX_BATCH_TOKENS, batch_records
+from context_packer import pack_context
+from hierarchical_semantic_search import (
+    CONTEXT_TOKEN_BUDGET,
+    answer_cache,
+    build_messages,
+    context_blocks,
+    create_reference_list,
+    embedding_cache,
+    retriever,
+)
+
+
+def load_questions(path):
+    """
+    Reads questions from a .jsonl file ({"id", "question", "section", "subsection"})
+    or a text file with one question per line.
+
+    Returns:
+        list: Dicts with at least id and question
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+                item.setdefault("id", str(number))
+            else:
+                item = {"id": str(number), "question": line}
+            items.append(item)
+    return items
+
+
+def completed_ids(path):
+    # Items answered by an earlier run, so a rerun only retries the failures
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short when an earlier run was killed mid-write
+                    continue
+                if "answer" in result:
+                    done.add(result["id"])
+    return done
+
+
+def end_last_line(path):
+    # Appending to a line cut short would corrupt the first result of this run too
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def retrieval_key(item, top_k):
+    return (normalize_text(item["question"]), top_k, item.get("section"), item.get("subsection"))
+
+
+async def answer_batch(client, items, output, top_k=5, expand=None, model=EMBEDDING_MODEL,
+                       query_concurrency=16, completion_concurrency=8, embed_concurrency=4,
+                       max_batch_items=MAX_BATCH_ITEMS, max_batch_tokens=MAX_BATCH_TOKENS):
+    """
+    Answers many questions against the hierarchical index, writing JSONL as items finish.
+
+    Questions are embedded in batched requests, identical retrievals run once,
+    vector queries and completions each run under their own concurrency limit.
+    Calls are retried on transient errors; an item that still fails is written
+    with an error field and the rest of the batch carries on.
+
+    Args:
+        client: AsyncOpenAI client
+        items: Dicts with id, question and optional section and subsection
+        output: Open text file to append JSONL results to
+        top_k: Matches retrieved per question
+        expand: Context expansion mode, see context_blocks
+        model: Embedding model name
+        query_concurrency: Vector queries in flight at once
+        completion_concurrency: Chat completions in flight at once
+        embed_concurrency: Embeddings requests in flight at once
+        max_batch_items: Maximum questions per embeddings request
+        max_batch_tokens: Maximum estimated tokens per embeddings request
+
+    Returns:
+        dict: Counts, elapsed seconds and per-stage StageStats
+    """
+    embed_stats = StageStats("embed")
+    query_stats = StageStats("query")
+    chat_stats = StageStats("chat")
+    query_slots = asyncio.Semaphore(query_concurrency)
+    completion_slots = asyncio.Semaphore(completion_concurrency)
+    embed_slots = asyncio.Semaphore(embed_concurrency)
+    started = time.perf_counter()
+
+    # One embedding per distinct question, requested in batches
+    questions = {}
+    for item in items:
+        questions.setdefault(normalize_text(item["question"]), item["question"])
+    embeddings = {}
+
+    async def embed_batch(batch):
+        async with embed_slots:
+            try:
+                vectors = await with_retries(embed_stats, embed_texts_async, client, [text for _, text, _ in batch], model, embedding_cache)
+            except Exception as e:
+                vectors = [e] * len(batch)
+        for (key, _, _), vector in zip(batch, vectors):
+            embeddings[key] = vector
+
+    await asyncio.gather(*(
+        embed_batch(batch)
+        for batch in batch_records(((key, text, None) for key, text in questions.items()), max_batch_items, max_batch_tokens)
+    ))
+
+    async def query(question, embedding, top_k, section, subsection):
+        # The Pinecone client is synchronous, keep it off the event loop
+        search = retriever.diversify if retriever.mmr_lambda is not None else retriever.search
+        async with query_slots:
+            return await with_retries(
+                query_stats, asyncio.to_thread, search, question, embedding, top_k, section, subsection
+            )
+
+    async def complete(question, search_results):
+        context, chunk_ids, _ = pack_context(context_blocks(search_results, expand), CONTEXT_TOKEN_BUDGET)
+        _, references = create_reference_list(search_results, chunk_ids)
+        async with completion_slots:
+            response = await with_retries(
+                chat_stats, client.chat.completions.create,
+                model="gpt-4-turbo-preview",
+                messages=build_messages(question, context, references),
+                temperature=0.7,
+                max_tokens=500,
+            )
+        return response.choices[0].message.content
+
+    # Identical questions share one retrieval and one completion
+    retrievals = {}
+    completions = {}
+
+    async def answer_item(item, item_started):
+        key = retrieval_key(item, top_k)
+        embedding = embeddings[key[0]]
+        if isinstance(embedding, Exception):
+            raise embedding
+
+        scope = (top_k, item.get("section"), item.get("subsection"), expand)
+        cached = await asyncio.to_thread(answer_cache.lookup, embedding, scope)
+        if cached is not None:
+            return cached, True
+
+        if key not in retrievals:
+            retrievals[key] = asyncio.ensure_future(query(item["question"], embedding, *key[1:]))
+        search_results = await retrievals[key]
+
+        if key not in completions:
+            completions[key] = asyncio.ensure_future(complete(item["question"], search_results))
+        answer = await completions[key]
+        latency = time.perf_counter() - item_started
+        await asyncio.to_thread(answer_cache.store, embedding, answer, scope, latency)
+        return answer, False
+
+    async def run(item):
+        item_started = time.perf_counter()
+        try:
+            answer, cached = await answer_item(item, item_started)
+            result = {"id": item["id"], "question": item["question"], "answer": answer, "cached": cached}
+        except Exception as e:
+            result = {"id": item["id"], "question": item["question"], "error": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - item_started) * 1000, 1)
+        return result
+
+    counts = {"answered": 0, "failed": 0}
+    for finished in asyncio.as_completed([run(item) for item in items]):
+        result = await finished
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        counts["answered" if "answer" in result else "failed"] += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        **counts,
+        "retrievals": len(retrievals),
+        "completions": len(completions),
+        "elapsed": elapsed,
+        "stages": [embed_stats, query_stats, chat_stats],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions against the hierarchical index")
+    parser.add_argument("questions", help=".jsonl file with id/question fields, or a text file with one question per line")
+    parser.add_argument("--output", default="answers.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--expand", choices=["neighbors", "subsection", "section"], default=None)
+    parser.add_argument("--query-concurrency", type=int, default=16)
+    parser.add_argument("--completion-concurrency", type=int, default=8)
+    parser.add_argument("--restart", action="store_true", help="Answer every question again instead of only the missing or failed ones")
+    args = parser.parse_args()
+
+    items = load_questions(args.questions)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = completed_ids(args.output)
+    end_last_line(args.output)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"{len(pending)} of {len(items)} questions to answer ({len(done)} already in {args.output})")
+
+    with open(args.output, "a", encoding="utf-8") as output:
+        summary = asyncio.run(answer_batch(
+            AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+            pending,
+            output,
+            top_k=args.top_k,
+            expand=args.expand,
+            query_concurrency=args.query_concurrency,
+            completion_concurrency=args.completion_concurrency,
+        ))
+
+    print(
+        f"Answered {summary['answered']}, failed {summary['failed']} in {summary['elapsed']:.1f}s "
+        f"({summary['retrievals']} retrievals, {summary['completions']} completions)"
+    )
+    for stage in summary["stages"]:
+        print(stage.summary())
+    answer_cache.report()
+    if summary["failed"]:
+        print(f"Rerun the same command to retry the {summary['failed']} failed questions")
+
+
+if __name__ == "__main__":
+    main()
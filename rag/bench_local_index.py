@@ -0,0 +1,67 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from local_index import LocalIndex
+
+
+def percentile_ms(latencies, pct):
+    return float(np.percentile(latencies, pct)) * 1000
+
+
+def run_queries(index, queries, top_k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        response = index.query(vector=query, top_k=top_k, namespace="bench")
+        latencies.append(time.perf_counter() - started)
+        results.append([match.id for match in response.matches])
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local vector index on random vectors")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--graph", action="store_true", help="Also benchmark the hnswlib graph index")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.vectors, args.dim), dtype=np.float32)
+    queries = data[rng.integers(0, args.vectors, args.queries)] + 0.1 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    path = tempfile.mkdtemp(prefix="local_index_bench_")
+
+    try:
+        index = LocalIndex(path, dtype=args.dtype)
+        started = time.perf_counter()
+        for start in range(0, args.vectors, 1000):
+            index.upsert(
+                [(f"vec_{i}", data[i], {}) for i in range(start, min(start + 1000, args.vectors))],
+                namespace="bench",
+            )
+        print(f"Upserted {args.vectors} x {args.dim} {args.dtype} vectors in {time.perf_counter() - started:.2f}s")
+
+        latencies, exact = run_queries(index, queries, args.top_k)
+        print(f"Exact:  p50 {percentile_ms(latencies, 50):.3f}ms  p95 {percentile_ms(latencies, 95):.3f}ms  {len(queries) / sum(latencies):.0f} QPS")
+
+        if args.graph:
+            index.graph_threshold = 1
+            started = time.perf_counter()
+            index.get_namespace("bench").build_graph()
+            print(f"Built HNSW graph in {time.perf_counter() - started:.2f}s")
+            latencies, approximate = run_queries(index, queries, args.top_k)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact)])
+            print(f"Graph:  p50 {percentile_ms(latencies, 50):.3f}ms  p95 {percentile_ms(latencies, 95):.3f}ms  "
+                  f"{len(queries) / sum(latencies):.0f} QPS  recall@{args.top_k} {recall:.3f}")
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
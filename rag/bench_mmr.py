@@ -0,0 +1,48 @@
+import argparse
+import time
+
+import numpy as np
+from bench_quantized_index import clustered_vectors
+from mmr import mmr_select
+
+
+def mean_pairwise_similarity(vectors):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarity = vectors @ vectors.T
+    count = len(vectors)
+    return float((similarity.sum() - count) / (count * (count - 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the latency and effect of MMR reranking")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'candidates':>10} {'p50':>9} {'p95':>9} {'top-k similarity':>17} {'MMR similarity':>15}")
+    for count in args.candidates:
+        # Few topics, and a question touching several of them: plain top-k fills
+        # up with near-duplicates from the closest topic
+        candidates = clustered_vectors(rng, count, args.dim, clusters=max(count // 20, 3), noise=0.3)
+        query = candidates[:3].sum(axis=0) + rng.standard_normal(args.dim, dtype=np.float32)
+
+        latencies = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            selected = mmr_select(query, candidates, args.top_k, args.lambda_mult)
+            latencies.append(time.perf_counter() - started)
+
+        normalized = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+        top = np.argsort(-(normalized @ query))[:args.top_k]
+        print(
+            f"{count:>10} {np.percentile(latencies, 50) * 1000:>7.3f}ms {np.percentile(latencies, 95) * 1000:>7.3f}ms "
+            f"{mean_pairwise_similarity(candidates[top]):>17.3f} {mean_pairwise_similarity(candidates[selected]):>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from local_index import LocalIndex
+from quantized_index import QuantizedIndex
+
+
+def clustered_vectors(rng, count, dim, clusters=200, noise=0.35):
+    # Embeddings are clustered by topic, uniform random vectors would understate recall
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    assignment = rng.integers(0, clusters, count)
+    return centers[assignment] + noise * rng.standard_normal((count, dim), dtype=np.float32)
+
+
+def run_queries(search, queries, top_k):
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        results.append([match.id for match in search(query, top_k).matches])
+    return results, len(queries) / (time.perf_counter() - started)
+
+
+def recall_at_k(results, exact):
+    return float(np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(results, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exact, int8 and binary quantized search on synthetic embeddings")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, nargs="+", default=[2, 4, 10])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_vectors(rng, args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    path = tempfile.mkdtemp(prefix="quantized_bench_")
+
+    try:
+        index = LocalIndex(path)
+        for start in range(0, args.vectors, 5000):
+            index.upsert(
+                [(f"vec_{i}", vectors[i], {}) for i in range(start, min(start + 5000, args.vectors))],
+                namespace="bench",
+            )
+        float_bytes = args.vectors * args.dim * 4
+
+        exact, qps = run_queries(lambda q, k: index.query(vector=q, top_k=k, namespace="bench"), queries, args.top_k)
+        print(f"{'mode':<18} {'memory':>10} {'QPS':>8} {'recall@' + str(args.top_k):>10}")
+        print(f"{'float32 exact':<18} {float_bytes / 1e6:>8.1f}MB {qps:>8.0f} {1.0:>10.3f}")
+
+        for mode in ("int8", "binary"):
+            for oversample in args.oversample:
+                quantized = QuantizedIndex(index, "bench", mode=mode, oversample=oversample)
+                if quantized.codes is None:
+                    quantized.build()
+                results, qps = run_queries(lambda q, k: quantized.query(q, k), queries, args.top_k)
+                label = f"{mode} x{oversample}"
+                print(f"{label:<18} {quantized.memory_bytes / 1e6:>8.1f}MB {qps:>8.0f} {recall_at_k(results, exact):>10.3f}")
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
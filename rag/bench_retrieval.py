@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from hierarchical_chunking import block_records, process_markdown, text
+from ingestion import chunk_records, ingest_chunks
+from local_index import LocalIndex
+from paragraph_chunking import paragraph_based_chunking
+from sentence_chucking import sentence_based_chunking_batch
+from simple_chunks_with_overlap import fixed_length_chunking
+
+WORD_PATTERN = re.compile(r"\w+")
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_questions.json")
+
+
+class HashingEmbeddings:
+    """
+    Deterministic local stand-in for the embeddings API.
+
+    Words and word bigrams are hashed into a fixed number of signed buckets and
+    the vector is L2 normalised. It is not a semantic model, but it is stable
+    across runs and machines, so differences between runs come from the
+    chunking and retrieval code rather than the embedding service.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.requests = 0
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = WORD_PATTERN.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        return vector / (np.linalg.norm(vector) or 1)
+
+    def create(self, input, model=None):
+        # Same response shape as client.embeddings.create
+        self.requests += 1
+        texts = [input] if isinstance(input, str) else input
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=self.embed(t).tolist()) for i, t in enumerate(texts)])
+
+
+def strategies(sentence_mode):
+    # Each strategy turns a document into (vector_id, text, metadata) records
+    return {
+        "simple_chunking_with_overlap": lambda doc, doc_id: chunk_records(fixed_length_chunking(doc), doc_id),
+        "paragraph_chunking": lambda doc, doc_id: chunk_records(paragraph_based_chunking(doc), doc_id),
+        "sentence_chunking": lambda doc, doc_id: chunk_records(next(sentence_based_chunking_batch([doc], mode=sentence_mode)), doc_id),
+        "hierarchical_chunking": lambda doc, doc_id: block_records(process_markdown(doc), doc_id),
+    }
+
+
+def normalize(value):
+    value = value.lower().replace("’", "'").replace("*", "")
+    return " ".join(value.split())
+
+
+def is_relevant(chunk_text, evidence):
+    # Labels are phrases rather than chunk IDs, so one question set fits every strategy
+    chunk_text = normalize(chunk_text)
+    return any(normalize(phrase) in chunk_text for phrase in evidence)
+
+
+def index_size(index, namespace):
+    # The vector file is preallocated, count only the rows in use plus the JSON files
+    ns = index.get_namespace(namespace)
+    json_bytes = sum(os.path.getsize(os.path.join(ns.path, name)) for name in os.listdir(ns.path) if name.endswith(".json"))
+    return ns.count * ns.dim * ns.dtype.itemsize + json_bytes
+
+
+def percentiles_ms(latencies):
+    return {f"p{pct}": round(float(np.percentile(latencies, pct)) * 1000, 3) for pct in (50, 95, 99)}
+
+
+def evaluate(name, build_records, documents, questions, embeddings, ks, repeats):
+    """
+    Ingests the corpus with one strategy into a fresh local index and scores the question set.
+
+    Returns:
+        dict: Chunk count, index size, ingest time, recall@k, MRR and latency percentiles
+    """
+    path = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        index = LocalIndex(path)
+        client = SimpleNamespace(embeddings=embeddings)
+
+        started = time.perf_counter()
+        records = [record for doc_id, doc in documents for record in build_records(doc, doc_id)]
+        chunk_seconds = time.perf_counter() - started
+        # Timed on its own, chunking is reported separately above
+        started = time.perf_counter()
+        ingest_chunks(client, index, records, namespace=name)
+        ingest_seconds = time.perf_counter() - started
+
+        texts = {vector_id: chunk for vector_id, chunk, _ in records}
+        top_k = max(ks)
+        hits = {k: 0 for k in ks}
+        reciprocal_ranks = []
+        answerable = 0
+        latencies = []
+        for item in questions:
+            for _ in range(repeats):
+                query_started = time.perf_counter()
+                vector = embeddings.embed(item["question"])
+                response = index.query(vector=vector, top_k=top_k, namespace=name)
+                latencies.append(time.perf_counter() - query_started)
+
+            if any(is_relevant(chunk, item["evidence"]) for chunk in texts.values()):
+                answerable += 1
+            rank = next(
+                (position for position, match in enumerate(response.matches, 1) if is_relevant(texts[match.id], item["evidence"])),
+                None,
+            )
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+            for k in ks:
+                hits[k] += rank is not None and rank <= k
+
+        chunk_lengths = [len(chunk) for chunk in texts.values()]
+        return {
+            "strategy": name,
+            "chunks": len(records),
+            "mean_chunk_chars": round(float(np.mean(chunk_lengths)), 1) if chunk_lengths else 0.0,
+            "index_bytes": index_size(index, name),
+            "chunk_seconds": round(chunk_seconds, 4),
+            "ingest_seconds": round(ingest_seconds, 4),
+            # Questions whose evidence survives chunking intact in at least one chunk
+            "answerable": answerable,
+            "recall": {f"@{k}": round(hits[k] / len(questions), 4) for k in ks},
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+            "query_latency_ms": percentiles_ms(latencies),
+        }
+    finally:
+        shutil.rmtree(path)
+
+
+def load_corpus(paths):
+    if not paths:
+        return [("document_1", text)]
+    documents = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            doc_id = re.sub(r"[^A-Za-z0-9_-]", "_", os.path.splitext(os.path.basename(path))[0])
+            documents.append((doc_id, f.read()))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval quality and cost of the chunking strategies")
+    parser.add_argument("--corpus", nargs="*", help="Markdown or text files to ingest, defaults to the example text")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="JSON list of {question, evidence} items")
+    parser.add_argument("--strategies", nargs="+", choices=list(strategies("sentencizer")), default=list(strategies("sentencizer")))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--dim", type=int, default=512, help="Dimensions of the hashing embedding")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed queries per question")
+    parser.add_argument("--sentence-mode", choices=["full", "senter", "sentencizer"], default="sentencizer",
+                        help="spaCy pipeline for sentence_chunking, sentencizer needs no model download")
+    parser.add_argument("--output", default="bench_retrieval.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+    documents = load_corpus(args.corpus)
+    builders = strategies(args.sentence_mode)
+
+    results = []
+    for name in args.strategies:
+        embeddings = HashingEmbeddings(args.dim)
+        results.append(evaluate(name, builders[name], documents, questions, embeddings, sorted(args.k), args.repeats))
+
+    recall_columns = [f"@{k}" for k in sorted(args.k)]
+    print(f"{'strategy':<30} {'chunks':>6} {'index':>9} {'ingest':>8} " + " ".join(f"{'R' + c:>6}" for c in recall_columns) + f" {'MRR':>6} {'p50':>8} {'p95':>8}")
+    for result in results:
+        print(
+            f"{result['strategy']:<30} {result['chunks']:>6} {result['index_bytes'] / 1024:>7.1f}KB {result['ingest_seconds']:>7.3f}s "
+            + " ".join(f"{result['recall'][c]:>6.2f}" for c in recall_columns)
+            + f" {result['mrr']:>6.3f} {result['query_latency_ms']['p50']:>6.3f}ms {result['query_latency_ms']['p95']:>6.3f}ms"
+        )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "corpus": [doc_id for doc_id, _ in documents],
+        "questions": len(questions),
+        "embedding": {"type": "hashing", "dim": args.dim},
+        "sentence_mode": args.sentence_mode,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+from sentence_chucking import (
+    build_sentence_model,
+    load_sentence_model,
+    sentence_based_chunking,
+    sentence_based_chunking_batch,
+    text,
+)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sentence chunking modes on the example text")
+    parser.add_argument("--docs", type=int, default=500, help="Number of documents to chunk")
+    parser.add_argument("--n-process", type=int, default=2, help="Worker processes for nlp.pipe")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    docs = [text] * args.docs
+
+    print(f"{'mode':<28} {'load (s)':>9} {'docs/sec':>10} {'same chunks':>12}")
+
+    _, load_time = timed(lambda: build_sentence_model("full"))
+    load_sentence_model("full")  # warm the cached pipeline outside the timed run
+    baseline, elapsed = timed(lambda: [sentence_based_chunking(doc) for doc in docs])
+    print(f"{'full, one doc at a time':<28} {load_time:>9.2f} {len(docs) / elapsed:>10.1f} {'100%':>12}")
+
+    for mode in ("full", "senter", "sentencizer"):
+        for n_process in sorted({1, args.n_process}):
+            _, load_time = timed(lambda: build_sentence_model(mode))
+            load_sentence_model(mode)
+            chunks, elapsed = timed(lambda: list(sentence_based_chunking_batch(
+                docs, mode=mode, n_process=n_process, batch_size=args.batch_size
+            )))
+            same = sum(a == b for a, b in zip(chunks, baseline)) / len(docs)
+            label = f"{mode}, pipe n_process={n_process}"
+            print(f"{label:<28} {load_time:>9.2f} {len(docs) / elapsed:>10.1f} {same:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import itertools
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from local_index import Match, QueryResponse, matches_filter
+from manifest import document_id, manifest_directory
+
+DEFAULT_BM25_DIR = ".bm25"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def encode_varints(values):
+    """
+    Encodes non-negative integers as LEB128 varints: 7 bits per byte, high bit set
+    on every byte but the last. Small row gaps and term frequencies take one byte.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        sizes += values >= (1 << (7 * k))
+    starts = np.cumsum(sizes) - sizes
+    encoded = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for k in range(int(sizes.max()) if len(values) else 0):
+        mask = sizes > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(sizes[mask] > k + 1, np.uint64(0x80), np.uint64(0))
+        encoded[starts[mask] + k] = byte
+    return encoded
+
+
+def decode_varints(encoded):
+    ends = np.flatnonzero(encoded < 0x80)
+    if not len(ends):
+        return np.empty(0, dtype=np.uint64)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Position of each byte within its value gives its shift
+    positions = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    parts = (encoded & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over the chunks of one namespace.
+
+    Built at ingestion time next to the vectors, with the same chunk IDs and
+    metadata, so exact terms like product codes or "Step 3: Pilot Program" can be
+    found even when the embedding misses them.
+
+    On disk the postings are one array of delta-encoded row numbers and one of
+    term frequencies, both as varint bytes, sliced per term by an offsets array.
+    In memory the row numbers are decoded once, so a query is a few vectorized
+    numpy operations per query term.
+
+    Like the chunk manifests, indexes are kept per backend and vector index, so
+    the postings always describe the chunks that index holds.
+    """
+
+    def __init__(self, namespace, index_name, backend=None, directory=DEFAULT_BM25_DIR, k1=1.2, b=0.75):
+        self.namespace = namespace
+        self.path = os.path.join(manifest_directory(index_name, backend, directory), namespace)
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.metadata = []
+        self.terms = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.uint32)
+        self.tfs = np.empty(0, dtype=np.uint16)
+        self.lengths = np.empty(0, dtype=np.int32)
+        self._row_postings = None
+        self._document_ids = None
+        self._dirty = False
+        if os.path.exists(os.path.join(self.path, "postings.npz")):
+            self._load()
+        self._prepare()
+
+    def _load(self):
+        with open(os.path.join(self.path, "chunks.json")) as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.metadata = data["metadata"]
+        with np.load(os.path.join(self.path, "postings.npz")) as postings:
+            terms = postings["terms"].tobytes().decode("utf-8")
+            self.terms = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+            self.offsets = postings["offsets"]
+            deltas = decode_varints(postings["deltas"])
+            self.tfs = decode_varints(postings["tfs"]).astype(np.uint16)
+            self.lengths = postings["lengths"]
+
+        # Undo the per-term delta encoding: cumulative sum, restarted at each term
+        total = np.cumsum(deltas, dtype=np.int64)
+        base = np.concatenate(([0], total))[self.offsets[:-1]]
+        self.rows = (total - np.repeat(base, np.diff(self.offsets))).astype(np.uint32)
+
+    def _prepare(self):
+        self._next_term = itertools.count(len(self.terms))
+        count = len(self.ids)
+        average = float(self.lengths.mean()) if count else 0.0
+        # Per-row length normalisation, the only part of BM25 that depends on the row
+        self._norm = (self.k1 * (1 - self.b + self.b * self.lengths / average)).astype(np.float32) if count else np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row_terms(self):
+        # Per-row (term ids, frequencies) are only needed to change the index, rebuild them from the postings
+        if self._row_postings is None and not self.ids:
+            self._row_postings = []
+        elif self._row_postings is None:
+            term_ids = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+            order = np.argsort(self.rows, kind="stable")
+            bounds = np.cumsum(np.bincount(self.rows, minlength=len(self.ids)))[:-1]
+            self._row_postings = list(zip(np.split(term_ids[order], bounds), np.split(self.tfs[order], bounds)))
+        return self._row_postings
+
+    def add_document(self, doc_id, records):
+        """
+        Replaces a document's chunks with the given records.
+
+        Section and subsection titles are indexed with the chunk text, so a query
+        naming a step or heading finds its chunks.
+
+        Args:
+            doc_id: Document the records belong to
+            records: (vector_id, text, metadata) tuples
+        """
+        self.remove_document(doc_id)
+        rows = self._row_terms()
+        for vector_id, text, metadata in records:
+            titles = [metadata.get("Section") or "", metadata.get("Subsection") or ""] if metadata else []
+            counts = Counter(tokenize(" ".join(titles + [text])))
+            # New terms take the next free id; ids of terms seen before are reused
+            term_ids = np.array(list(map(self.terms.setdefault, counts, self._next_term)), dtype=np.int64)
+            self.ids.append(vector_id)
+            self.metadata.append(metadata)
+            rows.append((term_ids, np.fromiter(counts.values(), dtype=np.int64, count=len(counts))))
+        self._documents().add(doc_id)
+        self._dirty = True
+
+    def remove_document(self, doc_id):
+        if doc_id not in self._documents():
+            return
+        rows = self._row_terms()
+        keep = [row for row, vector_id in enumerate(self.ids) if document_id(vector_id) != doc_id]
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self._row_postings = [rows[row] for row in keep]
+        self._documents().discard(doc_id)
+        self._dirty = True
+
+    def _documents(self):
+        if self._document_ids is None:
+            self._document_ids = {document_id(vector_id) for vector_id in self.ids}
+        return self._document_ids
+
+    def _build(self):
+        # Postings are rebuilt once after a batch of changes, not per document
+        if not self._dirty:
+            return
+        self._dirty = False
+        sizes = [len(term_ids) for term_ids, _ in self._row_postings]
+        term_ids = np.concatenate([t for t, _ in self._row_postings]) if self._row_postings else np.empty(0, dtype=np.int64)
+        tfs = np.concatenate([f for _, f in self._row_postings]) if self._row_postings else np.empty(0, dtype=np.int64)
+        rows = np.repeat(np.arange(len(self._row_postings), dtype=np.uint32), sizes)
+
+        # Renumber the terms still in use in first-seen order, dropping removed ones
+        vocabulary = {t: term for term, t in self.terms.items()}
+        used, term_ids = np.unique(term_ids, return_inverse=True)
+        self.terms = {vocabulary[t]: i for i, t in enumerate(used.tolist())}
+        self._row_postings = None
+
+        # A stable sort by term keeps the rows of each posting list in order
+        order = np.argsort(term_ids, kind="stable")
+        self.rows = rows[order]
+        self.tfs = np.minimum(tfs[order], 65535).astype(np.uint16)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(used)), dtype=np.int64)))
+        self.lengths = np.bincount(rows, weights=tfs, minlength=len(self.ids)).astype(np.int32)
+        self._prepare()
+
+    def save(self):
+        self._build()
+        os.makedirs(self.path, exist_ok=True)
+        deltas = self.rows.astype(np.int64)
+        deltas[1:] -= deltas[:-1].copy()
+        starts = self.offsets[:-1][np.diff(self.offsets) > 0]
+        deltas[starts] = self.rows[starts]
+
+        tmp = os.path.join(self.path, "postings.tmp.npz")
+        np.savez(
+            tmp,
+            terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            deltas=encode_varints(deltas),
+            tfs=encode_varints(self.tfs),
+            lengths=self.lengths,
+        )
+        with open(os.path.join(self.path, "chunks.tmp.json"), "w") as f:
+            json.dump({"ids": self.ids, "metadata": self.metadata}, f)
+        os.replace(tmp, os.path.join(self.path, "postings.npz"))
+        os.replace(os.path.join(self.path, "chunks.tmp.json"), os.path.join(self.path, "chunks.json"))
+
+    def query(self, text, top_k=10, filter=None, include_metadata=True):
+        """
+        Ranks chunks by BM25 score for a text query.
+
+        Args:
+            text: The query text
+            top_k: Number of matches
+            filter: Optional Pinecone style metadata filter
+            include_metadata: Return the stored metadata with each match
+
+        Returns:
+            QueryResponse: Matches with a score above zero, best first
+        """
+        self._build()
+        count = len(self.ids)
+        scores = np.zeros(count, dtype=np.float32)
+        for term in set(tokenize(text)):
+            t = self.terms.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[rows])
+
+        candidates = np.flatnonzero(scores)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        matches = []
+        for row in candidates:
+            if filter and not matches_filter(self.metadata[row], filter):
+                continue
+            matches.append(Match(self.ids[row], float(scores[row]), self.metadata[row] if include_metadata else None))
+            if len(matches) == top_k:
+                break
+        return QueryResponse(matches, self.namespace)
+
+
+def reciprocal_rank_fusion(responses, top_k=5, k=60):
+    """
+    Merges ranked results by summing 1 / (k + rank) over the lists each ID appears in.
+
+    Args:
+        responses: Query responses to merge, e.g. vector and BM25 results
+        top_k: Number of matches to return
+        k: Damping constant, 60 as in the original RRF paper
+
+    Returns:
+        QueryResponse: Fused matches, scored by their RRF score
+    """
+    scores = {}
+    first = {}
+    for response in responses:
+        for rank, match in enumerate(response['matches'], 1):
+            scores[match.id] = scores.get(match.id, 0.0) + 1 / (k + rank)
+            # Keep the first list's match, vector results carry values when requested
+            first.setdefault(match.id, match)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    matches = [
+        Match(vector_id, scores[vector_id], first[vector_id].metadata, getattr(first[vector_id], 'values', None) or None)
+        for vector_id in ranked
+    ]
+    namespace = getattr(responses[0], 'namespace', None) if responses else None
+    return QueryResponse(matches, namespace)
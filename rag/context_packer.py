@@ -0,0 +1,160 @@
+import re
+
+from manifest import document_id
+from token_chunking import count_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def chunk_number(vector_id):
+    # Chunk IDs are written as f"{doc_id}_chunk_{i}", i being the ChunkNumber
+    try:
+        return int(vector_id.rsplit("_chunk_", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def shingles(text, size=3):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def is_near_duplicate(candidate, kept, threshold):
+    # Jaccard similarity of word 3-grams, or one text contained in the other
+    for other in kept:
+        overlap = len(candidate & other)
+        if overlap / len(candidate | other) >= threshold or overlap == min(len(candidate), len(other)):
+            return True
+    return False
+
+
+def format_context(blocks):
+    """
+    Formats packed blocks with one Section header per group and one Subsection
+    header per subsection within it, instead of headers on every block.
+
+    Groups are per document and section, so two documents with a section of
+    the same title keep their text apart.
+    """
+    groups = {}
+    for block in blocks:
+        groups.setdefault((block["doc"], block["section"]), {}).setdefault(block["subsection"], []).append(block)
+
+    context = ""
+    for (_, section), subsections in groups.items():
+        context += f"\nSection: {section or 'General'}\n"
+        for subsection, runs in subsections.items():
+            if subsection:
+                context += f"Subsection: {subsection}\n"
+            context += "\n\n".join(run["text"] for run in runs) + "\n"
+    return context
+
+
+def merge_runs(blocks):
+    """
+    Orders blocks by section and chunk number, merging blocks whose chunks follow
+    each other in the same document and subsection into one run of text.
+    """
+    # Sections are ordered by their best score, blocks within a section by position
+    section_rank = {}
+    for block in blocks:
+        key = (block["doc"], block["section"])
+        section_rank[key] = max(section_rank.get(key, float("-inf")), block["score"])
+    ordered = sorted(
+        blocks,
+        key=lambda block: (-section_rank[(block["doc"], block["section"])], block["doc"], block["section"], block["first"] if block["first"] is not None else -1),
+    )
+
+    runs = []
+    for block in ordered:
+        previous = runs[-1] if runs else None
+        if (
+            previous is not None
+            and previous["doc"] == block["doc"]
+            and previous["section"] == block["section"]
+            and previous["subsection"] == block["subsection"]
+            and previous["last"] is not None
+            and block["first"] == previous["last"] + 1
+        ):
+            previous["text"] += "\n" + block["text"]
+            previous["ids"] = previous["ids"] + block["ids"]
+            previous["last"] = block["last"]
+            previous["score"] = max(previous["score"], block["score"])
+        else:
+            runs.append(dict(block))
+    return runs
+
+
+def pack_context(blocks, max_tokens=2000, duplicate_threshold=0.8):
+    """
+    Assembles prompt context from retrieved blocks within a hard token budget.
+
+    Blocks are taken in score order. Near-duplicates of a block already taken are
+    dropped, blocks that no longer fit are skipped in favour of smaller, lower
+    scoring ones. The kept blocks are grouped by section and runs of consecutive
+    chunks are merged, so each section and subsection header appears once.
+
+    Args:
+        blocks: Dicts with ids, text, section, subsection and optionally score,
+            e.g. from SectionTree.expand
+        max_tokens: Budget for the formatted context, in cl100k_base tokens
+        duplicate_threshold: Word 3-gram Jaccard similarity above which a block
+            counts as a near-duplicate
+
+    Returns:
+        tuple: (context string, IDs of the chunks used, stats dict)
+    """
+    candidates = []
+    for position, block in enumerate(blocks):
+        numbers = [chunk_number(vector_id) for vector_id in block["ids"]]
+        candidates.append({
+            "ids": list(block["ids"]),
+            "text": block["text"].strip(),
+            "section": block["section"],
+            "subsection": block["subsection"],
+            # Without a score, keep the retrieval order
+            "score": block.get("score", -position),
+            "doc": document_id(block["ids"][0]),
+            "first": None if None in numbers else min(numbers),
+            "last": None if None in numbers else max(numbers),
+        })
+    candidates.sort(key=lambda block: block["score"], reverse=True)
+
+    stats = {"blocks": len(blocks), "duplicates": 0, "over_budget": 0}
+    kept = []
+    kept_shingles = []
+    headers = set()
+    used_tokens = 0
+    for block in candidates:
+        block_shingles = shingles(block["text"])
+        if is_near_duplicate(block_shingles, kept_shingles, duplicate_threshold):
+            stats["duplicates"] += 1
+            continue
+
+        # Headers are only paid for the first block of a section or subsection
+        cost = count_tokens(block["text"]) + 2
+        for header in (("Section", block["doc"], block["section"]), ("Subsection", block["doc"], block["section"], block["subsection"])):
+            if header[-1] and header not in headers:
+                cost += count_tokens(f"{header[0]}: {header[-1]}\n")
+        if used_tokens + cost > max_tokens:
+            stats["over_budget"] += 1
+            continue
+
+        used_tokens += cost
+        headers.update({("Section", block["doc"], block["section"]), ("Subsection", block["doc"], block["section"], block["subsection"])})
+        kept.append(block)
+        kept_shingles.append(block_shingles)
+
+    # The estimate above is per block; enforce the budget on the final string
+    context = format_context(merge_runs(kept))
+    while kept and count_tokens(context) > max_tokens:
+        kept.pop()
+        stats["over_budget"] += 1
+        context = format_context(merge_runs(kept))
+
+    stats["kept"] = len(kept)
+    stats["tokens"] = count_tokens(context)
+    chunk_ids = [vector_id for block in kept for vector_id in block["ids"]]
+    return context, chunk_ids, stats
@@ -1,18 +1,16 @@
-from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
-from docx import Document
 import os
+from bm25_index import BM25Index
+from embedding_cache import EmbeddingCache
+from ingestion import ingest_chunks
+from manifest import ChunkManifest
+from section_tree import SectionTree
+from vector_store import open_index
 
 # Load environment variables from the parent directory
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def process_markdown(markdown_content):
     content_blocks = []
     current_section = None
@@ -38,6 +36,26 @@ def process_markdown(markdown_content):
 
     return content_blocks
 
+def block_records(content_blocks, doc_id="document_1"):
+    for i, block in enumerate(content_blocks):
+        if block["content"].strip():  # Skip empty content
+            # Clean metadata by removing None values and ensuring proper types
+            metadata = {
+                "DocID": doc_id,
+                "ChunkNumber": i,
+                "text": block["content"]
+            }
+
+            # Only add section and subsection if they exist
+            if block.get("section"):
+                metadata["Section"] = block["section"]
+            if block.get("subsection"):
+                metadata["Subsection"] = block["subsection"]
+            if block.get("token_count"):
+                metadata["TokenCount"] = block["token_count"]
+
+            yield f"{doc_id}_chunk_{i}", block["content"], metadata
+
 # Example text
 text = """
 # Introduction
@@ -109,39 +127,31 @@ Measuring the success of a digital transformation initiative involves setting ke
 Digital transformation is a journey, not a destination. Organizations that succeed in digital transformation continuously evolve their strategies, adapt to changing technologies, and place a strong emphasis on data management and employee engagement. By following a structured framework and embracing a culture of innovation, companies can position themselves for long-term success in a digital-first world.
 """
 
-index = pc.Index('insert_your_index_name_here') # Ensure you put in the name of the index that you created in pinecone here
-print("Assigned Pinecone index 'insert_your_index_name_here'")
-
-# Process the markdown content and retrieve content with metadata
-content_blocks = process_markdown(text)
-
-# Generate embeddings and store in Pinecone
-print("Starting to process and store text chunks...")
-for i, block in enumerate(content_blocks):
-    if block["content"].strip():  # Skip empty content
-        print(f"Processing chunk {i+1}...")
-        response = client.embeddings.create(input=block["content"], model="text-embedding-3-small")
-        embedding = response.data[0].embedding
-        print(f"Generated embedding for chunk {i+1}")
-
-        # Clean metadata by removing None values and ensuring proper types
-        metadata = {
-            "DocID": "document_1",
-            "ChunkNumber": i,
-            "text": block["content"]
-        }
-
-        # Only add section and subsection if they exist
-        if block.get("section"):
-            metadata["Section"] = block["section"]
-        if block.get("subsection"):
-            metadata["Subsection"] = block["subsection"]
-
-        index.upsert(
-            vectors=[(f"document_1_chunk_{i}", embedding, metadata)],
-            namespace="hierarchical_chunking"
-        )
-        print(f"Stored chunk {i+1} in Pinecone index")
-
-print("Finished processing and storing all chunks")
+if __name__ == "__main__":
+    # Initialize the OpenAI client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    index_name = 'insert_your_index_name_here' # Ensure you put in the name of the index that you created in pinecone here
+    index = open_index(index_name)
+    print(f"Assigned index '{index_name}'")
+
+    # Process the markdown content and retrieve content with metadata
+    content_blocks = process_markdown(text)
+    records = list(block_records(content_blocks))
+
+    # Generate embeddings and store in Pinecone
+    print("Starting to process and store text chunks...")
+    ingest_chunks(client, index, records, namespace="hierarchical_chunking",
+                  cache=EmbeddingCache(), manifest=ChunkManifest("hierarchical_chunking", index_name))
+
+    # Record the section structure so search hits can be expanded locally
+    tree = SectionTree("hierarchical_chunking", index_name)
+    tree.add_document("document_1", records)
+    tree.save()
+
+    # Lexical index over the same chunk IDs for hybrid search
+    lexical_index = BM25Index("hierarchical_chunking", index_name)
+    lexical_index.add_document("document_1", records)
+    lexical_index.save()
 
+    print("Finished processing and storing all chunks")
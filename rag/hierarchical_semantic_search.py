@@ -1,35 +1,85 @@
-from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
 from docx import Document
 import os
+import sys
+import threading
+import time
 from collections import defaultdict
+from answer_cache import AnswerCache
+from bm25_index import BM25Index
+from context_packer import pack_context
+from embedding_cache import EmbeddingCache
+from manifest import file_generation
+from retriever import Retriever
+from section_tree import SectionTree
+from vector_store import open_index
 
 # Load environment variables from the parent directory
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
 # Initialize the OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-index = pc.Index('insert_your_index_name_here') # Ensure you put in the name of the index that you created in pinecone here
-
-def semantic_search(question, top_k=5):
-    # Generate embedding for the question
-    question_embedding = client.embeddings.create(
-        input=question,
-        model="text-embedding-3-small"
-    ).data[0].embedding
-
-    # Search Pinecone index
-    search_results = index.query(
-        namespace="hierarchical_chunking",
-        vector=question_embedding,
-        top_k=top_k,
-        include_metadata=True
-    )
+INDEX_NAME = 'insert_your_index_name_here' # Ensure you put in the name of the index that you created in pinecone here
+index = open_index(INDEX_NAME)
+
+NAMESPACE = "hierarchical_chunking"
+
+# Hard limit on the context put in the prompt, in tokens
+CONTEXT_TOKEN_BUDGET = 2000
+
+# Set between 0 and 1 (e.g. 0.7) to rerank results by maximal marginal relevance,
+# lower values favour diversity over similarity to the question
+MMR_LAMBDA = None
+
+# Persistent cache so repeated questions don't get re-embedded
+embedding_cache = EmbeddingCache()
+
+# Section structure written by hierarchical_chunking.py, used to expand hits
+section_tree = SectionTree(NAMESPACE, INDEX_NAME)
+
+# BM25 index written by hierarchical_chunking.py, fused with the vector results
+lexical_index = BM25Index(NAMESPACE, INDEX_NAME)
+
+# Embeds each question once and shares the retrieval between search and answer
+retriever = Retriever(
+    client, index, NAMESPACE, embedding_cache, lexical_index=lexical_index, mmr_lambda=MMR_LAMBDA, index_name=INDEX_NAME
+)
+
+# Reuses answers for near-duplicate questions until the namespace is re-ingested
+answer_cache = AnswerCache(NAMESPACE, INDEX_NAME)
+
+def saved_generations():
+    # Both files are replaced last when the tree and the BM25 index are saved
+    return file_generation(section_tree.path), file_generation(os.path.join(lexical_index.path, "chunks.json"))
+
+loaded_generations = saved_generations()
+reload_lock = threading.Lock()
+
+def reload_indexes():
+    """
+    Re-reads the section tree and the BM25 index if they were saved since they
+    were loaded, so a long-running process like rag_service.py serves the
+    postings and chunk text of the latest ingest.
+
+    Returns:
+        bool: True if they were reloaded
+    """
+    global section_tree, lexical_index, loaded_generations
+    with reload_lock:
+        generations = saved_generations()
+        if generations == loaded_generations:
+            return False
+        section_tree = SectionTree(NAMESPACE, INDEX_NAME)
+        lexical_index = retriever.lexical_index = BM25Index(NAMESPACE, INDEX_NAME)
+        loaded_generations = generations
+        retriever.invalidate()
+        return True
+
+def semantic_search(question, top_k=5, section=None, subsection=None, search_results=None):
+    if search_results is None:
+        search_results = retriever.retrieve(question, top_k, section, subsection)
 
     print(f"\nTop {top_k} relevant chunks for question: '{question}'\n")
     for i, match in enumerate(search_results['matches'], 1):
@@ -38,20 +88,28 @@ def semantic_search(question, top_k=5):
         print(f"Subsection: {match.metadata.get('Subsection', 'N/A')}")
         print(f"Text: {match.metadata['text']}\n")
 
-def create_reference_list(search_results):
+    return search_results
+
+def create_reference_list(search_results, chunk_ids=None):
     """
     Creates a hierarchical reference list from search results.
     
     Args:
         search_results: The results from the Pinecone query
+        chunk_ids: IDs of the chunks packed into the context, from pack_context.
+            Matches that did not fit are left out, so only what the answer
+            can draw on is cited
         
     Returns:
         tuple: (reference_list dict, formatted_references string)
     """
     reference_list = defaultdict(set)
+    packed = set(chunk_ids) if chunk_ids is not None else None
     
     # Build reference list
     for match in search_results['matches']:
+        if packed is not None and match.id not in packed:
+            continue
         section = match.metadata.get('Section', 'General')
         subsection = match.metadata.get('Subsection', '')
         
@@ -70,60 +128,204 @@ def create_reference_list(search_results):
                 
     return reference_list, formatted_references
 
-def generate_response(question, top_k=5):
-    # Generate embedding for the question
-    question_embedding = client.embeddings.create(
-        input=question,
-        model="text-embedding-3-small"
-    ).data[0].embedding
-
-    # Search Pinecone index
-    search_results = index.query(
-        namespace="hierarchical_chunking",
-        vector=question_embedding,
-        top_k=top_k,
-        include_metadata=True
-    )
+def context_blocks(search_results, expand=None, window=1):
+    """
+    Selects the blocks of text to put in the prompt.
 
-    # Prepare context from the relevant chunks
-    context = ""
-    for match in search_results['matches']:
-        section = match.metadata.get('Section', 'General')
-        subsection = match.metadata.get('Subsection', '')
-        text = match.metadata['text']
-        context += f"\nSection: {section}"
-        if subsection:
-            context += f"\nSubsection: {subsection}"
-        context += f"\nContent: {text}\n"
-    
-    # Get reference list
-    _, references = create_reference_list(search_results)
+    Args:
+        search_results: The results from the Pinecone query
+        expand: None to use each hit on its own, or "neighbors", "subsection"
+            or "section" to expand hits through the section tree
+        window: Neighbours either side of a hit when expand="neighbors"
 
-    prompt = f"""Based on the following context, please provide a comprehensive answer to the question.
-    If the context doesn't contain enough information, please say so.
+    Returns:
+        list: Dicts with ids, section, subsection, text and score
+    """
+    if expand:
+        return section_tree.expand(search_results['matches'], expand, window)
+    return [
+        {
+            "ids": [match.id],
+            "section": match.metadata.get('Section', ''),
+            "subsection": match.metadata.get('Subsection', ''),
+            "text": match.metadata['text'],
+            "score": match.score,
+        }
+        for match in search_results['matches']
+    ]
+
+def build_messages(question, context, references=None):
+    """
+    Builds the chat messages for answering a question.
+
+    Args:
+        question: The question text
+        context: The context from pack_context
+        references: Formatted reference list the model should repeat, or None
+            when the caller appends it itself
+
+    Returns:
+        list: The chat messages
+    """
+    if references is None:
+        system = "You are a helpful AI assistant that provides detailed, accurate answers based on the given context."
+        instructions = ""
+    else:
+        system = "You are a helpful AI assistant that provides detailed, accurate answers based on the given context. Always include the provided reference list at the end of your response."
+        instructions = f"""
     After your response, please include the following reference list:
     {references}
+"""
 
+    prompt = f"""Based on the following context, please provide a comprehensive answer to the question.
+    If the context doesn't contain enough information, please say so.{instructions}
     Context:
     {context}
 
     Question: {question}
-
+    """
+    if references is not None:
+        prompt += """
     Please format your response with the answer first, followed by the reference list.
     """
 
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+def prepare_answer(question, top_k=5, section=None, subsection=None, expand=None, search_results=None, use_cache=True, timings=None):
+    """
+    Runs the stages before generation: embed, answer cache lookup, query and pack.
+
+    Args:
+        question: The question text
+        top_k: Number of matches to retrieve
+        section: Optional section to restrict the search to
+        subsection: Optional subsection within that section
+        expand: Context expansion mode, see context_blocks
+        search_results: Results of an earlier semantic_search for the question
+        use_cache: Look up the answer in the answer cache
+        timings: Optional dict that receives the seconds spent in each stage
+
+    Returns:
+        dict: The cached answer, or the context, chunk IDs and references to generate one
+    """
+    timings = timings if timings is not None else {}
+    scope = (top_k, section, subsection, expand)
+
+    mark = time.perf_counter()
+    embedding = retriever.embed(question)
+    timings["embed"] = time.perf_counter() - mark
+    if use_cache:
+        answer = answer_cache.lookup(embedding, scope)
+        if answer is not None:
+            return {"answer": answer, "embedding": embedding, "scope": scope}
+
+    mark = time.perf_counter()
+    if search_results is None:
+        search_results = retriever.retrieve(question, top_k, section, subsection)
+    timings["query"] = time.perf_counter() - mark
+
+    # Pack the relevant chunks into the context budget
+    mark = time.perf_counter()
+    context, chunk_ids, _ = pack_context(context_blocks(search_results, expand), CONTEXT_TOKEN_BUDGET)
+    timings["pack"] = time.perf_counter() - mark
+
+    # Get reference list, of what made it into the context
+    _, references = create_reference_list(search_results, chunk_ids)
+    return {
+        "answer": None,
+        "embedding": embedding,
+        "scope": scope,
+        "context": context,
+        "references": references,
+    }
+
+def generate_response(question, top_k=5, section=None, subsection=None, expand=None, search_results=None, use_cache=True, timings=None):
+    started = time.perf_counter()
+    timings = timings if timings is not None else {}
+    prepared = prepare_answer(question, top_k, section, subsection, expand, search_results, use_cache, timings)
+    if prepared["answer"] is not None:
+        timings["total"] = time.perf_counter() - started
+        return prepared["answer"]
+
     # Get response from OpenAI
+    mark = time.perf_counter()
     response = client.chat.completions.create(
         model="gpt-4-turbo-preview",
-        messages=[
-            {"role": "system", "content": "You are a helpful AI assistant that provides detailed, accurate answers based on the given context. Always include the provided reference list at the end of your response."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_messages(question, prepared["context"], prepared["references"]),
         temperature=0.7,
         max_tokens=500
     )
+    timings["generate"] = time.perf_counter() - mark
+
+    answer = response.choices[0].message.content
+    timings["total"] = time.perf_counter() - started
+    if use_cache:
+        answer_cache.store(prepared["embedding"], answer, prepared["scope"], latency=timings["total"])
+    return answer
+
+def stream_response(question, top_k=5, section=None, subsection=None, expand=None, search_results=None, use_cache=True, stats=None):
+    """
+    Streaming variant of generate_response.
 
-    return response.choices[0].message.content
+    Yields the answer text as tokens arrive, followed by the reference list.
+    The generator can be printed from the command line or returned as-is as a
+    streamed HTTP response body.
+
+    Args:
+        question: The question text
+        top_k: Number of matches to retrieve
+        section: Optional section to restrict the search to
+        subsection: Optional subsection within that section
+        expand: Context expansion mode, see context_blocks
+        search_results: Results of an earlier semantic_search for the question
+        use_cache: Look up and store the answer in the answer cache
+        stats: Optional dict that receives per-stage, ttft and total latency in seconds
+
+    Yields:
+        str: Pieces of the answer
+    """
+    started = time.perf_counter()
+    stats = stats if stats is not None else {}
+    prepared = prepare_answer(question, top_k, section, subsection, expand, search_results, use_cache, stats)
+    if prepared["answer"] is not None:
+        stats["ttft"] = stats["total"] = time.perf_counter() - started
+        stats["cached"] = True
+        yield prepared["answer"]
+        return
+
+    mark = time.perf_counter()
+    stream = client.chat.completions.create(
+        model="gpt-4-turbo-preview",
+        messages=build_messages(question, prepared["context"]),
+        temperature=0.7,
+        max_tokens=500,
+        stream=True
+    )
+
+    pieces = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        token = chunk.choices[0].delta.content
+        if token:
+            if not pieces:
+                stats["ttft"] = time.perf_counter() - started
+            pieces.append(token)
+            yield token
+    stats["generate"] = time.perf_counter() - mark
+
+    # The model isn't asked to repeat the references, they are appended verbatim
+    pieces.append(prepared["references"])
+    yield prepared["references"]
+
+    stats["total"] = time.perf_counter() - started
+    stats["cached"] = False
+    stats.setdefault("ttft", stats["total"])
+    if use_cache:
+        answer_cache.store(prepared["embedding"], "".join(pieces), prepared["scope"], latency=stats["total"])
 
 # Example usage
 if __name__ == "__main__":
@@ -131,9 +333,19 @@ if __name__ == "__main__":
     question = "What are the key components of a digital strategy?"
 
     print("\n=== Relevant Chunks ===")
-    semantic_search(question)
+    search_results = semantic_search(question)
 
     print("\n=== AI Generated Response ===")
-    answer = generate_response(question)
-    print(answer)
+    if "--stream" in sys.argv:
+        stats = {}
+        for token in stream_response(question, expand="subsection", search_results=search_results, stats=stats):
+            print(token, end="", flush=True)
+        print(f"\n\nTime to first token: {stats['ttft']:.2f}s, total: {stats['total']:.2f}s")
+    else:
+        answer = generate_response(question, expand="subsection", search_results=search_results)
+        print(answer)
+
+    embedding_cache.report()
+    retriever.report()
+    answer_cache.report()
 
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from openai import OpenAI
+from dotenv import load_dotenv
+from docx import Document
+from async_ingestion import run_ingestion_pipeline
+from bm25_index import BM25Index
+from embedding_cache import EmbeddingCache
+from hierarchical_chunking import block_records, process_markdown
+from ingestion import ingest_chunks
+from manifest import DEFAULT_MANIFEST_DIR, ChunkManifest, manifest_directory
+from section_tree import SectionTree
+from vector_store import open_index
+
+# Load environment variables from the parent directory
+load_dotenv()
+
+SUPPORTED_EXTENSIONS = (".md", ".txt", ".docx")
+
+# Word heading styles mapped to the markdown headings process_markdown understands
+DOCX_HEADINGS = {"Title": "# ", "Heading 1": "# ", "Heading 2": "## "}
+
+
+def discover_files(root):
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        paths.extend(
+            os.path.join(directory, filename)
+            for filename in sorted(filenames)
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS)
+        )
+    return paths
+
+
+def document_id_for(path, root):
+    # Stable across runs and machines: the path relative to the ingested directory.
+    # Replacing characters can map two paths to one name, the hash of the real
+    # path keeps their IDs apart.
+    relative = os.path.relpath(path, root).replace(os.sep, "/")
+    suffix = hashlib.sha256(relative.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9._/-]', '_', relative)}-{suffix}"
+
+
+def docx_to_markdown(path):
+    lines = []
+    for paragraph in Document(path).paragraphs:
+        prefix = DOCX_HEADINGS.get(paragraph.style.name, "")
+        lines.append(prefix + paragraph.text)
+    return "\n".join(lines)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_file(path, root, chunker):
+    """
+    Reads and chunks one file. Runs in a worker process.
+
+    Args:
+        path: File to parse
+        root: Directory being ingested, used for the document ID
+        chunker: "hierarchical" (one chunk per line) or "token" (token packed)
+
+    Returns:
+        tuple: (document ID, file hash, list of (vector_id, text, metadata) records)
+    """
+    if path.lower().endswith(".docx"):
+        content = docx_to_markdown(path)
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            content = f.read()
+
+    blocks = process_markdown(content)
+    if chunker == "token":
+        from token_chunking import token_based_chunking
+
+        blocks = token_based_chunking(blocks)
+
+    doc_id = document_id_for(path, root)
+    return doc_id, file_hash(path), list(block_records(blocks, doc_id=doc_id))
+
+
+class FileCheckpoint:
+    """Hashes of files whose chunks were all stored, so unchanged files are not parsed again."""
+
+    def __init__(self, namespace, index_name, backend=None, directory=DEFAULT_MANIFEST_DIR):
+        # Kept next to the chunk manifest, so a different index or backend starts over
+        self.path = os.path.join(manifest_directory(index_name, backend, directory), f"{namespace}.files.json")
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.files = json.load(f)
+
+    def is_done(self, doc_id, path):
+        return self.files.get(doc_id) == file_hash(path)
+
+    def save(self, done, removed=()):
+        self.files.update(done)
+        for doc_id in removed:
+            self.files.pop(doc_id, None)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.files, f)
+        os.replace(tmp, self.path)
+
+
+def parsed_records(paths, root, chunker, workers, done, tree=None, lexical_index=None):
+    """
+    Parses files in a process pool and yields their records as files finish.
+    Files are submitted as earlier ones finish, at most 2 x workers at a time.
+
+    Args:
+        paths: Files to parse
+        root: Directory being ingested
+        chunker: Chunking strategy passed to parse_file
+        workers: Number of worker processes
+        done: Dict filled with {document ID: file hash} for every parsed file
+        tree: Optional SectionTree each parsed document is added to
+        lexical_index: Optional BM25Index each parsed document is added to
+
+    Returns:
+        generator: (vector_id, text, metadata) records from all files
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # At most two files per worker in flight, so parsed records never pile
+        # up far ahead of embedding however many files there are
+        remaining = iter(paths)
+        in_flight = {}
+        finished = 0
+
+        def submit():
+            for path in remaining:
+                in_flight[pool.submit(parse_file, path, root, chunker)] = path
+                if len(in_flight) >= 2 * workers:
+                    break
+
+        submit()
+        while in_flight:
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                path = in_flight.pop(future)
+                finished += 1
+                try:
+                    doc_id, digest, records = future.result()
+                except Exception as e:
+                    print(f"[{finished}/{len(paths)}] Failed to parse {path}: {e}")
+                    continue
+                print(f"[{finished}/{len(paths)}] Parsed {doc_id}: {len(records)} chunks")
+                if tree is not None:
+                    tree.add_document(doc_id, records)
+                if lexical_index is not None:
+                    lexical_index.add_document(doc_id, records)
+                yield from records
+                done[doc_id] = digest
+            submit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, embed and store every .md/.txt/.docx file in a directory")
+    parser.add_argument("directory", help="Directory to ingest")
+    parser.add_argument("--index", default="insert_your_index_name_here", help="Name of the index to write to")
+    # Not hierarchical_chunking's namespace, whose document_1 this run does not own
+    parser.add_argument("--namespace", default="directory", help="Namespace to write to, set the search NAMESPACE to match")
+    parser.add_argument("--chunker", choices=["hierarchical", "token"], default="hierarchical")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes used to parse and chunk files")
+    parser.add_argument("--async-pipeline", action="store_true", help="Use the asyncio embed/upsert pipeline")
+    parser.add_argument("--force", action="store_true", help="Re-parse files even if they are unchanged")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.directory)
+    checkpoint = FileCheckpoint(args.namespace, args.index)
+    # The manifest is saved every few upserts and when the run stops, so an
+    # interrupted run resumes where it stopped: chunks already stored are skipped
+    manifest = ChunkManifest(args.namespace, args.index)
+    paths = discover_files(root)
+    doc_ids = {document_id_for(path, root) for path in paths}
+    # A checkpointed file is only done while its chunks are still in the manifest
+    pending = [
+        path for path in paths
+        if args.force
+        or document_id_for(path, root) not in manifest.documents
+        or not checkpoint.is_done(document_id_for(path, root), path)
+    ]
+    # Only files this command ingested before are its to delete
+    removed = sorted(set(checkpoint.files) - doc_ids)
+    print(
+        f"Found {len(paths)} files, {len(paths) - len(pending)} unchanged since the last run, "
+        f"{len(removed)} removed"
+    )
+    if not pending and not removed:
+        return
+
+    index = open_index(args.index)
+    cache = EmbeddingCache()
+    # Chunks of removed files are deleted from the index
+    manifest.drop(removed)
+    tree = SectionTree(args.namespace, args.index)
+    lexical_index = BM25Index(args.namespace, args.index)
+    for doc_id in removed:
+        tree.remove_document(doc_id)
+        lexical_index.remove_document(doc_id)
+    done = {}
+    records = parsed_records(pending, root, args.chunker, args.workers, done, tree, lexical_index)
+
+    if args.async_pipeline:
+        run_ingestion_pipeline(records, index, args.namespace, cache=cache, manifest=manifest)
+    else:
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        ingest_chunks(client, index, records, args.namespace, cache=cache, manifest=manifest)
+
+    tree.save()
+    lexical_index.save()
+    checkpoint.save(done, removed)
+    print(f"Finished ingesting {len(done)} files, removed {len(removed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import time
+
+from manifest import delete_stale
+from vector_store import flush_index
+
+# Embedding model used by all of the chunking scripts
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# OpenAI accepts up to 2048 inputs and ~300k tokens per embeddings request.
+# We stay well under both so a single oversized batch never gets rejected.
+MAX_BATCH_ITEMS = 512
+MAX_BATCH_TOKENS = 100_000
+
+# Pinecone recommends upserting 1536-dim vectors in batches of around 100
+UPSERT_BATCH_SIZE = 100
+
+
+def estimate_tokens(text):
+    # English averages ~4 characters per token. Counting 3 over-estimates on
+    # purpose (code and non-English text run denser) so a batch never under counts
+    return len(text) // 3 + 1
+
+
+def chunk_records(chunks, doc_id="document_1"):
+    """
+    Turns a sequence of chunk strings into (id, text, metadata) records.
+
+    Args:
+        chunks: Iterable of chunk strings
+        doc_id: Prefix used for the vector IDs
+
+    Returns:
+        generator: (vector_id, text, metadata) tuples
+    """
+    for i, chunk in enumerate(chunks):
+        yield f"{doc_id}_chunk_{i}", chunk, {"text": chunk}
+
+
+def batch_records(records, max_items=MAX_BATCH_ITEMS, max_tokens=MAX_BATCH_TOKENS):
+    """
+    Packs records into batches bounded by item count and estimated tokens.
+
+    Args:
+        records: Iterable of (vector_id, text, metadata) tuples
+        max_items: Maximum number of records per batch
+        max_tokens: Maximum estimated tokens per batch
+
+    Returns:
+        generator: Lists of records
+    """
+    batch = []
+    batch_tokens = 0
+    for record in records:
+        tokens = estimate_tokens(record[1])
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(record)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_texts(client, texts, model=EMBEDDING_MODEL, cache=None):
+    """
+    Embeds a list of texts with a single embeddings request.
+
+    Args:
+        client: OpenAI client
+        texts: List of strings to embed
+        model: Embedding model name
+        cache: Optional EmbeddingCache, only cache misses are sent to the API
+
+    Returns:
+        list: One embedding per text, in input order
+    """
+    if cache is None:
+        return _create_embeddings(client, texts, model)
+
+    embeddings = cache.get_many(model, texts)
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if missing:
+        fresh = dict(zip(missing, _create_embeddings(client, missing, model)))
+        cache.put_many(model, missing, [fresh[text] for text in missing])
+        embeddings = [fresh[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+    return embeddings
+
+
+def _create_embeddings(client, texts, model):
+    response = client.embeddings.create(input=texts, model=model)
+    # The API returns an index per item, sort on it rather than trusting the order
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class IngestionStats:
+    def __init__(self):
+        self.chunks = 0
+        self.embed_requests = 0
+        self.upsert_requests = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def chunks_per_sec(self):
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        print(
+            f"Ingested {self.chunks} chunks in {self.elapsed:.2f}s "
+            f"({self.chunks_per_sec:.1f} chunks/sec, "
+            f"{self.embed_requests} embedding requests, {self.upsert_requests} upsert requests)"
+        )
+
+
+def ingest_chunks(client, index, records, namespace, model=EMBEDDING_MODEL,
+                  max_batch_items=MAX_BATCH_ITEMS, max_batch_tokens=MAX_BATCH_TOKENS,
+                  upsert_batch_size=UPSERT_BATCH_SIZE, cache=None, manifest=None):
+    """
+    Embeds records in batches and writes the vectors to the index in bulk.
+
+    Args:
+        client: OpenAI client
+        index: Pinecone index (anything with an upsert(vectors, namespace) method)
+        records: Iterable of (vector_id, text, metadata) tuples, consumed lazily
+        namespace: Index namespace to write to
+        model: Embedding model name
+        max_batch_items: Maximum texts per embeddings request
+        max_batch_tokens: Maximum estimated tokens per embeddings request
+        upsert_batch_size: Maximum vectors per upsert request
+        cache: Optional EmbeddingCache shared across runs
+        manifest: Optional ChunkManifest, unchanged chunks are skipped and
+            chunks no longer produced for a document, and the documents
+            dropped from the manifest, are deleted
+
+    Returns:
+        IngestionStats: Counters and timings for the run
+    """
+    stats = IngestionStats()
+    pending = []
+
+    def flush(vectors):
+        index.upsert(vectors=vectors, namespace=namespace)
+        stats.upsert_requests += 1
+        if manifest is not None:
+            manifest.commit([vector_id for vector_id, _, _ in vectors])
+
+    if manifest is not None:
+        records = manifest.filter(records)
+
+    try:
+        for batch in batch_records(records, max_batch_items, max_batch_tokens):
+            texts = [text for _, text, _ in batch]
+            misses_before = cache.misses if cache is not None else 0
+            embeddings = embed_texts(client, texts, model, cache)
+            if cache is None or cache.misses > misses_before:
+                stats.embed_requests += 1
+            stats.chunks += len(batch)
+            pending.extend(
+                (vector_id, embedding, metadata)
+                for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+            )
+            print(f"Embedded {stats.chunks} chunks so far")
+
+            while len(pending) >= upsert_batch_size:
+                flush(pending[:upsert_batch_size])
+                pending = pending[upsert_batch_size:]
+
+        if pending:
+            flush(pending)
+    except BaseException:
+        # Keep the record of what was stored, so a rerun resumes where this one stopped
+        if manifest is not None:
+            manifest.save()
+        raise
+    if manifest is not None:
+        delete_stale(index, manifest, namespace)
+    flush_index(index)
+
+    stats.finish().report()
+    if cache is not None:
+        cache.report()
+    if manifest is not None:
+        manifest.report()
+    return stats
@@ -0,0 +1,421 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # The approximate graph index is optional
+    hnswlib = None
+
+
+class Match:
+    """A single query match, readable as match.score or match['score'] like Pinecone's."""
+
+    __slots__ = ("id", "score", "metadata", "values")
+
+    def __init__(self, id, score, metadata=None, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+        self.values = values
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+
+class QueryResponse:
+    def __init__(self, matches, namespace):
+        self.matches = matches
+        self.namespace = namespace
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+def matches_filter(metadata, filter):
+    """
+    Evaluates a Pinecone style metadata filter ($eq, $ne, $in, $nin, $and, $or).
+
+    Args:
+        metadata: Metadata dict of a vector
+        filter: Filter dict, e.g. {"Section": {"$eq": "Introduction"}}
+
+    Returns:
+        bool: Whether the metadata matches
+    """
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+    return True
+
+
+class _Namespace:
+    """
+    Vectors of one namespace, stored as a memory-mapped (capacity x dim) matrix.
+
+    Row i of the matrix belongs to ids[i]; deletes move the last row into the hole
+    so the live rows are always the first `count` rows.
+
+    Vectors are written to the matrix in place. Ids and metadata of each write
+    are appended to records.log, which save() folds into records.json, so a
+    write costs the size of its batch rather than a rewrite of every record.
+    """
+
+    def __init__(self, path, dtype, metric):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.metric = metric
+        self.lock = threading.RLock()
+        self.graph = None
+        self.matrix = None
+        os.makedirs(path, exist_ok=True)
+
+        info = self._read_json("info.json", None)
+        if info:
+            self.dim = info["dim"]
+            self.capacity = info["capacity"]
+            self.dtype = np.dtype(info["dtype"])
+            self.version = info.get("version", 0)
+            records = self._read_json("records.json", {"ids": [], "metadata": []})
+            self.ids = records["ids"]
+            self.metadata = records["metadata"]
+            saved_version = records.get("version", 0)
+            self._map()
+        else:
+            self.dim = None
+            self.capacity = 0
+            self.version = 0
+            self.ids = []
+            self.metadata = []
+            saved_version = 0
+        self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self.logged = self._replay(saved_version)
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_json(self, name, default):
+        if not os.path.exists(self._file(name)):
+            return default
+        with open(self._file(name)) as f:
+            return json.load(f)
+
+    def _write_json(self, name, data):
+        # Write then rename so a crash never leaves a half written file
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._file(name))
+
+    def _replay(self, saved_version):
+        # Writes since the last save(); the vectors are already in the matrix
+        if not os.path.exists(self._file("records.log")):
+            return 0
+        entries = 0
+        with open(self._file("records.log"), "rb+") as f:
+            while line := f.readline():
+                if not line.endswith(b"\n"):
+                    # A write interrupted mid-line never returned to its caller, drop it
+                    f.truncate(f.tell() - len(line))
+                    break
+                entry = json.loads(line)
+                if entry["version"] <= saved_version:
+                    # Already in records.json, save() stopped before removing the log
+                    continue
+                if "upsert" in entry:
+                    self._assign_rows(*entry["upsert"])
+                else:
+                    self._remove_rows(entry["delete"])
+                self.version = entry["version"]
+                entries += 1
+        return entries
+
+    def _log(self, entry):
+        # Bumped on every write so derived structures (graph, quantized codes) know they are stale
+        self.version += 1
+        entry["version"] = self.version
+        with open(self._file("records.log"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.logged += 1
+
+    def _write_info(self):
+        self._write_json("info.json", {
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "dtype": self.dtype.name,
+            "metric": self.metric,
+            "version": self.version,
+        })
+
+    def _map(self):
+        if self.capacity:
+            self.matrix = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r+", shape=(self.capacity, self.dim))
+
+    def _grow(self, needed):
+        capacity = max(needed, self.capacity * 2, 1024)
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(self._file("vectors.bin"), "ab") as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self.capacity = capacity
+        self._map()
+        # The logged records are only readable with the grown matrix
+        self._write_info()
+
+    def prepare(self, values):
+        values = np.asarray(values, dtype=np.float32)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(values, axis=-1, keepdims=True)
+            values = values / np.where(norms == 0, 1, norms)
+        return values
+
+    def save(self):
+        """Writes all records to records.json and empties the log."""
+        with self.lock:
+            if not self.logged:
+                return
+            if self.matrix is not None:
+                self.matrix.flush()
+            self._write_json("records.json", {"ids": self.ids, "metadata": self.metadata, "version": self.version})
+            self._write_info()
+            os.remove(self._file("records.log"))
+            self.logged = 0
+
+    def _assign_rows(self, ids, metadata):
+        rows = []
+        for vector_id, meta in zip(ids, metadata):
+            row = self.rows.get(vector_id)
+            if row is None:
+                row = self.rows[vector_id] = len(self.ids)
+                self.ids.append(vector_id)
+                self.metadata.append(meta)
+            else:
+                self.metadata[row] = meta
+            rows.append(row)
+        return rows
+
+    def _remove_rows(self, ids, matrix=None):
+        for vector_id in ids:
+            row = self.rows.pop(vector_id, None)
+            if row is None:
+                continue
+            last = self.count - 1
+            if row != last:
+                if matrix is not None:
+                    matrix[row] = matrix[last]
+                self.ids[row] = self.ids[last]
+                self.metadata[row] = self.metadata[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.metadata.pop()
+
+    def upsert(self, ids, values, metadata):
+        values = self.prepare(values)
+        with self.lock:
+            if self.dim is None:
+                self.dim = values.shape[1]
+            elif values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match namespace dimension {self.dim}")
+
+            rows = self._assign_rows(ids, metadata)
+            if self.count > self.capacity:
+                self._grow(self.count)
+            self.matrix[rows] = values
+            self.graph = None
+            self._log({"upsert": [list(ids), list(metadata)]})
+
+    def delete(self, ids):
+        with self.lock:
+            ids = list(ids)
+            self._remove_rows(ids, self.matrix)
+            self.graph = None
+            self._log({"delete": ids})
+
+    def scores(self, query, block_size=8192):
+        # Score block by block so float16 storage is upcast a slice at a time
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, block_size):
+            block = self.matrix[start:min(start + block_size, self.count)]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        return scores
+
+    def build_graph(self, ef_construction=200, m=16):
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for the approximate index: pip install hnswlib")
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        graph.init_index(max_elements=max(self.count, 1), ef_construction=ef_construction, M=m)
+        graph.add_items(np.asarray(self.matrix[:self.count], dtype=np.float32), np.arange(self.count))
+        self.graph = graph
+        return graph
+
+
+class LocalIndex:
+    """
+    On-box vector index with the upsert/query/delete/fetch surface of a Pinecone index.
+
+    Each namespace is a memory-mapped float32 or float16 matrix queried with a
+    vectorized NumPy top-k. When hnswlib is installed, namespaces with at least
+    `graph_threshold` vectors are searched through an HNSW graph instead. With
+    `quantization` set to "int8" or "binary", unfiltered queries run a first pass
+    over compressed codes and rescore the candidates exactly (see quantized_index.py).
+    """
+
+    def __init__(self, path=".local_index", dtype="float32", metric="cosine", graph_threshold=None, ef_search=64,
+                 quantization=None, oversample=4):
+        if metric not in ("cosine", "dotproduct"):
+            raise ValueError("metric must be 'cosine' or 'dotproduct'")
+        self.path = path
+        self.dtype = dtype
+        self.metric = metric
+        self.graph_threshold = graph_threshold
+        self.ef_search = ef_search
+        self.quantization = quantization
+        self.oversample = oversample
+        self._namespaces = {}
+        self._quantized = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get_namespace(self, namespace):
+        with self._lock:
+            if namespace not in self._namespaces:
+                directory = os.path.join(self.path, namespace or "__default__")
+                self._namespaces[namespace] = _Namespace(directory, self.dtype, self.metric)
+            return self._namespaces[namespace]
+
+    def get_quantized(self, namespace):
+        from quantized_index import QuantizedIndex
+
+        quantized = self._quantized.get(namespace)
+        if quantized is None:
+            # Built outside self._lock, QuantizedIndex looks the namespace up itself
+            quantized = QuantizedIndex(self, namespace, self.quantization, self.oversample)
+            with self._lock:
+                quantized = self._quantized.setdefault(namespace, quantized)
+        return quantized
+
+    def upsert(self, vectors, namespace=""):
+        if not vectors:
+            return {"upserted_count": 0}
+        ids, values, metadata = [], [], []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                ids.append(vector["id"])
+                values.append(vector["values"])
+                metadata.append(vector.get("metadata") or {})
+            else:
+                ids.append(vector[0])
+                values.append(vector[1])
+                metadata.append(vector[2] if len(vector) > 2 else {})
+        self.get_namespace(namespace).upsert(ids, values, metadata)
+        return {"upserted_count": len(ids)}
+
+    def query(self, vector, top_k=10, namespace="", include_metadata=False, include_values=False, filter=None):
+        ns = self.get_namespace(namespace)
+        with ns.lock:
+            if not ns.count:
+                return QueryResponse([], namespace)
+            query = ns.prepare(vector)
+            top_k = min(top_k, ns.count)
+
+            use_graph = (
+                filter is None
+                and self.graph_threshold is not None
+                and ns.count >= self.graph_threshold
+            )
+            if filter is None and self.quantization and not use_graph:
+                return self.get_quantized(namespace).query(vector, top_k, include_metadata, include_values)
+            if use_graph:
+                graph = ns.graph or ns.build_graph()
+                graph.set_ef(max(self.ef_search, top_k))
+                labels, distances = graph.knn_query(query, k=top_k)
+                # hnswlib's "ip" distance is 1 - dot product
+                rows, scores = labels[0], 1 - distances[0]
+            else:
+                scores = ns.scores(query)
+                if filter is not None:
+                    mask = np.fromiter((matches_filter(meta, filter) for meta in ns.metadata), dtype=bool, count=ns.count)
+                    scores[~mask] = -np.inf
+                    top_k = min(top_k, int(mask.sum()))
+                rows = np.argpartition(-scores, top_k - 1)[:top_k] if top_k else np.array([], dtype=int)
+                rows = rows[np.argsort(-scores[rows])]
+                scores = scores[rows]
+
+            matches = [
+                Match(
+                    ns.ids[row],
+                    float(score),
+                    ns.metadata[row] if include_metadata else None,
+                    np.asarray(ns.matrix[row], dtype=np.float32).tolist() if include_values else None,
+                )
+                for row, score in zip(rows, scores)
+            ]
+        return QueryResponse(matches, namespace)
+
+    def fetch(self, ids, namespace=""):
+        ns = self.get_namespace(namespace)
+        with ns.lock:
+            vectors = {}
+            for vector_id in ids:
+                row = ns.rows.get(vector_id)
+                if row is not None:
+                    vectors[vector_id] = {
+                        "id": vector_id,
+                        "values": np.asarray(ns.matrix[row], dtype=np.float32).tolist(),
+                        "metadata": ns.metadata[row],
+                    }
+        return {"vectors": vectors, "namespace": namespace}
+
+    def delete(self, ids=None, namespace="", delete_all=False):
+        ns = self.get_namespace(namespace)
+        ns.delete(list(ns.ids) if delete_all else ids or [])
+        return {}
+
+    def flush(self):
+        """Compacts the record log of every open namespace, call it once a bulk write is done."""
+        with self._lock:
+            namespaces = list(self._namespaces.values())
+        for ns in namespaces:
+            ns.save()
+
+    def describe_index_stats(self):
+        namespaces = {}
+        for name in sorted(os.listdir(self.path)):
+            namespace = "" if name == "__default__" else name
+            namespaces[namespace] = {"vector_count": self.get_namespace(namespace).count}
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
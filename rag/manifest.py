@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+
+DEFAULT_MANIFEST_DIR = ".manifests"
+
+# Upsert or delete batches between two writes of the manifest. Rewriting the
+# whole file after every batch makes a large ingestion quadratic; a crash only
+# loses the record of the last few batches, whose chunks are embedded again.
+SAVE_EVERY_BATCHES = 20
+
+
+def manifest_directory(index_name, backend=None, directory=DEFAULT_MANIFEST_DIR):
+    """
+    Where the manifests of one index live.
+
+    What was stored is only true of one index on one backend, so switching
+    VECTOR_BACKEND or the index name starts from empty manifests instead of
+    skipping every chunk as already stored.
+    """
+    backend = backend or os.getenv("VECTOR_BACKEND", "pinecone")
+    return os.path.join(directory, backend, index_name)
+
+
+def file_generation(path):
+    """
+    Identifies one version of a file, or None when there is none.
+
+    Manifests, section trees and BM25 indexes are rewritten whenever their
+    namespace is written to, so in-process copies of what the namespace holds
+    compare generations to know they are stale.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(text, metadata):
+    payload = json.dumps([text, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def document_id(vector_id):
+    # Chunk IDs are written as f"{doc_id}_chunk_{i}"
+    return vector_id.rsplit("_chunk_", 1)[0]
+
+
+class ChunkManifest:
+    """
+    Remembers the chunk IDs and content hashes written to a namespace.
+
+    Records pass through filter() before embedding: unchanged chunks are dropped,
+    new and changed ones go through and are committed once they are upserted.
+    IDs that belonged to a re-ingested document but were not seen again are stale,
+    and so are all IDs of documents the caller drop()s. Documents that are
+    neither seen nor dropped are left alone: several entry points may write to
+    one namespace, and a run only speaks for the documents it ingests.
+
+    Args:
+        namespace: Index namespace the chunks are written to
+        index_name: Name of the index, as passed to open_index
+        backend: "pinecone" or "local", defaults to the VECTOR_BACKEND env variable
+        directory: Root directory of the manifests
+        save_every: Committed or removed batches between two saves, call save()
+            once more when the run is over
+    """
+
+    def __init__(self, namespace, index_name, backend=None, directory=DEFAULT_MANIFEST_DIR,
+                 save_every=SAVE_EVERY_BATCHES):
+        self.namespace = namespace
+        self.save_every = save_every
+        self.path = os.path.join(manifest_directory(index_name, backend, directory), f"{namespace}.json")
+        self.version = 0
+        self.documents = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.version = data["version"]
+            self.documents = data["documents"]
+
+        self._seen = {}
+        self._dropped = set()
+        self._pending = {}
+        self._unsaved = 0
+        self.skipped = 0
+        self.added = 0
+        self.updated = 0
+        self.deleted = 0
+
+    def filter(self, records):
+        """
+        Yields only the records that are new or whose content changed.
+
+        Args:
+            records: Iterable of (vector_id, text, metadata) tuples
+
+        Returns:
+            generator: The records that need to be embedded and upserted
+        """
+        for record in records:
+            vector_id, text, metadata = record
+            doc_id = document_id(vector_id)
+            self._seen.setdefault(doc_id, set()).add(vector_id)
+            digest = content_hash(text, metadata)
+            previous = self.documents.get(doc_id, {}).get(vector_id)
+            if previous == digest:
+                self.skipped += 1
+                continue
+            if previous is None:
+                self.added += 1
+            else:
+                self.updated += 1
+            self._pending[vector_id] = digest
+            yield record
+
+    def commit(self, vector_ids):
+        """Marks upserted IDs as stored."""
+        for vector_id in vector_ids:
+            digest = self._pending.pop(vector_id, None)
+            if digest is not None:
+                self.documents.setdefault(document_id(vector_id), {})[vector_id] = digest
+        self._changed()
+
+    def drop(self, doc_ids):
+        """
+        Marks whole documents as gone from the source, e.g. files deleted since
+        the last run, so all of their chunks are stale.
+        """
+        self._dropped.update(doc_ids)
+
+    def stale_ids(self):
+        """
+        IDs no longer in the source: chunks of seen documents that were not
+        seen again, and every chunk of a dropped document.
+        """
+        stale = []
+        for doc_id, chunks in self.documents.items():
+            seen = self._seen.get(doc_id)
+            if seen is None:
+                if doc_id in self._dropped:
+                    stale.extend(chunks)
+                continue
+            stale.extend(vector_id for vector_id in chunks if vector_id not in seen)
+        return stale
+
+    def remove(self, vector_ids):
+        """Forgets deleted IDs."""
+        for vector_id in vector_ids:
+            doc_id = document_id(vector_id)
+            chunks = self.documents.get(doc_id, {})
+            if chunks.pop(vector_id, None) is not None:
+                self.deleted += 1
+            if doc_id in self.documents and not chunks:
+                del self.documents[doc_id]
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Write then rename so a crash mid-write keeps the previous manifest
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": self.version, "documents": self.documents}, f)
+        os.replace(tmp, self.path)
+        self._unsaved = 0
+
+    def report(self):
+        print(
+            f"Manifest '{self.namespace}': {self.added} new, {self.updated} updated, "
+            f"{self.skipped} skipped, {self.deleted} deleted"
+        )
+
+
+def delete_stale(index, manifest, namespace, batch_size=1000):
+    """
+    Deletes the manifest's stale IDs from the index and saves the manifest.
+
+    Args:
+        index: Pinecone index or LocalIndex
+        manifest: ChunkManifest that has filtered this run's records
+        namespace: Index namespace
+        batch_size: Maximum IDs per delete request
+
+    Returns:
+        list: The deleted IDs
+    """
+    stale = manifest.stale_ids()
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        index.delete(ids=batch, namespace=namespace)
+        manifest.remove(batch)
+    manifest.save()
+    return stale
@@ -0,0 +1,74 @@
+import numpy as np
+from local_index import Match, QueryResponse
+
+
+def mmr_select(query, candidates, top_k=5, lambda_mult=0.7):
+    """
+    Picks a diverse top-k by maximal marginal relevance.
+
+    Each step takes the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected).
+    Relevance is one matrix-vector product; only the top_k rows of the
+    candidate similarity matrix are ever needed, so each step computes one
+    row and updates a running maximum instead of building the n x n matrix.
+
+    Args:
+        query: Query vector, shape (dim,)
+        candidates: Candidate vectors, shape (n, dim)
+        top_k: Number of candidates to select
+        lambda_mult: 1 ranks purely by relevance, 0 purely by diversity
+
+    Returns:
+        list: Row indices of the selected candidates, in selection order
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if not len(candidates):
+        return []
+    query = np.asarray(query, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+
+    top_k = min(top_k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    redundancy = candidates @ candidates[selected[0]]
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < top_k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+    return selected
+
+
+def mmr_rerank(search_results, query, top_k=5, lambda_mult=0.7, vectors=None):
+    """
+    Reranks over-fetched search results with MMR.
+
+    Args:
+        search_results: Query response whose matches include their values
+        query: The query embedding
+        top_k: Number of matches to keep
+        lambda_mult: Relevance versus diversity trade-off, see mmr_select
+        vectors: Optional {id: vector} for matches returned without values
+
+    Returns:
+        QueryResponse: The selected matches, in selection order with their original scores
+    """
+    vectors = vectors or {}
+    matches = [
+        match for match in search_results['matches']
+        if getattr(match, 'values', None) or match.id in vectors
+    ]
+    candidates = np.array([vectors.get(match.id) or match.values for match in matches], dtype=np.float32)
+    order = mmr_select(query, candidates, top_k, lambda_mult)
+    selected = [
+        Match(matches[i].id, matches[i].score, matches[i].metadata, candidates[i].tolist())
+        for i in order
+    ]
+    return QueryResponse(selected, getattr(search_results, 'namespace', None))
@@ -1,18 +1,15 @@
-from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import spacy
+from embedding_cache import EmbeddingCache
+from ingestion import chunk_records, ingest_chunks
+from manifest import ChunkManifest
+from vector_store import open_index
 
 # Load environment variables from the parent directory
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def paragraph_based_chunking(text):
     paragraphs = [p for p in text.split("\n") if p.strip()]
     return paragraphs
@@ -83,21 +80,17 @@ Measuring the success of a digital transformation initiative involves setting ke
 Digital transformation is a journey, not a destination. Organizations that succeed in digital transformation continuously evolve their strategies, adapt to changing technologies, and place a strong emphasis on data management and employee engagement. By following a structured framework and embracing a culture of innovation, companies can position themselves for long-term success in a digital-first world.
 """
 
-index = pc.Index('insert_your_index_name_here')  # Ensure you put in the name of the index that you created in pinecone here
-print("Assigned Pinecone index 'insert_your_index_name_here'")
+if __name__ == "__main__":
+    # Initialize the OpenAI client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Generate and store chunks
-print("Starting to process and store text chunks...")
-for i, chunk in enumerate(paragraph_based_chunking(text)):
-    print(f"Processing chunk {i+1}...")
-    response = client.embeddings.create(input=chunk, model="text-embedding-3-small")
-    embedding = response.data[0].embedding
-    print(f"Generated embedding for chunk {i+1}")
+    index_name = 'insert_your_index_name_here'  # Ensure you put in the name of the index that you created in pinecone here
+    index = open_index(index_name)
+    print(f"Assigned index '{index_name}'")
 
-    index.upsert(
-        vectors=[(f"document_1_chunk_{i}", embedding, {"text": chunk})],
-        namespace="paragraph_chunking"
-    )
-    print(f"Stored chunk {i+1} in Pinecone index")
+    # Generate and store chunks
+    print("Starting to process and store text chunks...")
+    ingest_chunks(client, index, chunk_records(paragraph_based_chunking(text)), namespace="paragraph_chunking",
+                  cache=EmbeddingCache(), manifest=ChunkManifest("paragraph_chunking", index_name))
 
-print("Finished processing and storing all chunks")
\ No newline at end of file
+    print("Finished processing and storing all chunks")
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+from local_index import Match, QueryResponse
+
+# Number of set bits for every byte value, used for vectorized Hamming distance
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize_binary(matrix):
+    # One sign bit per dimension, 32x smaller than float32. Rows are padded to
+    # whole 64-bit words so Hamming distance can run on uint64 views.
+    bits = np.packbits(matrix > 0, axis=1)
+    padding = -bits.shape[1] % 8
+    if padding:
+        bits = np.pad(bits, ((0, 0), (0, padding)))
+    return bits
+
+
+def hamming_distances(codes, query_bits):
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(np.bitwise_xor(codes.view(np.uint64), query_bits.view(np.uint64))).sum(axis=1, dtype=np.int32)
+    return POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedIndex:
+    """
+    Compressed first-pass search over a LocalIndex namespace.
+
+    Only the int8 or binary codes are held in memory. The best `oversample * top_k`
+    candidates are rescored against the full-precision vectors, which stay in the
+    namespace's memory-mapped file on disk.
+    """
+
+    def __init__(self, index, namespace, mode="int8", oversample=4, block_size=512):
+        if mode not in ("int8", "binary"):
+            raise ValueError("mode must be 'int8' or 'binary'")
+        self.ns = index.get_namespace(namespace)
+        self.namespace = namespace
+        self.mode = mode
+        self.oversample = oversample
+        self.block_size = block_size
+        self.codes = None
+        self.scale = None
+        self.version = None
+        self._load()
+
+    def _file(self):
+        return os.path.join(self.ns.path, f"codes_{self.mode}.npz")
+
+    def _load(self):
+        if not os.path.exists(self._file()):
+            return
+        with np.load(self._file()) as data:
+            if int(data["version"]) == self.ns.version:
+                self.codes = data["codes"]
+                self.scale = data["scale"] if self.mode == "int8" else None
+                self.version = self.ns.version
+
+    def build(self):
+        """(Re)computes the codes from the namespace vectors and saves them next to it."""
+        with self.ns.lock:
+            codes = []
+            scale = None
+            if self.mode == "int8":
+                # The scale must cover the whole namespace, so compute it in a first pass
+                scale = np.zeros(self.ns.dim, dtype=np.float32)
+                for start in range(0, self.ns.count, self.block_size):
+                    block = np.asarray(self.ns.matrix[start:min(start + self.block_size, self.ns.count)], dtype=np.float32)
+                    scale = np.maximum(scale, np.abs(block).max(axis=0))
+                scale = scale / 127
+                scale[scale == 0] = 1
+
+            for start in range(0, self.ns.count, self.block_size):
+                block = np.asarray(self.ns.matrix[start:min(start + self.block_size, self.ns.count)], dtype=np.float32)
+                if self.mode == "int8":
+                    codes.append(np.clip(np.rint(block / scale), -127, 127).astype(np.int8))
+                else:
+                    codes.append(quantize_binary(block))
+
+            width = self.ns.dim if self.mode == "int8" else (self.ns.dim + 63) // 64 * 8
+            dtype = np.int8 if self.mode == "int8" else np.uint8
+            self.codes = np.concatenate(codes) if codes else np.empty((0, width), dtype=dtype)
+            self.scale = scale
+            self.version = self.ns.version
+            np.savez(
+                self._file(),
+                codes=self.codes,
+                scale=scale if scale is not None else np.empty(0, dtype=np.float32),
+                version=self.version,
+            )
+
+    @property
+    def memory_bytes(self):
+        return 0 if self.codes is None else self.codes.nbytes
+
+    def first_pass(self, query, count):
+        """Rows of the `count` best candidates by approximate score."""
+        if self.mode == "int8":
+            # Fold the scale into the query instead of dequantizing the codes, and
+            # upcast small blocks so each one stays in cache for the matmul
+            scaled = query * self.scale
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), self.block_size):
+                block = self.codes[start:start + self.block_size]
+                scores[start:start + len(block)] = block.astype(np.float32) @ scaled
+        else:
+            query_bits = quantize_binary(query[None, :])[0]
+            # Fewer differing bits is better, negate so higher scores win
+            scores = -hamming_distances(self.codes, query_bits)
+
+        count = min(count, len(scores))
+        return np.argpartition(-scores, count - 1)[:count]
+
+    def query(self, vector, top_k=10, include_metadata=False, include_values=False):
+        with self.ns.lock:
+            if self.version != self.ns.version:
+                self.build()
+            if not self.ns.count:
+                return QueryResponse([], self.namespace)
+
+            query = self.ns.prepare(vector)
+            candidates = np.sort(self.first_pass(query, top_k * self.oversample))
+            # Exact rescoring reads only the candidate rows from disk
+            exact = np.asarray(self.ns.matrix[candidates], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:top_k]
+
+            matches = [
+                Match(
+                    self.ns.ids[row],
+                    float(score),
+                    self.ns.metadata[row] if include_metadata else None,
+                    np.asarray(self.ns.matrix[row], dtype=np.float32).tolist() if include_values else None,
+                )
+                for row, score in zip(candidates[order], exact[order])
+            ]
+        return QueryResponse(matches, self.namespace)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import time
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.serving import WSGIRequestHandler
+
+from section_tree import EXPANSION_MODES
+
+# Largest top_k a request may ask for
+MAX_TOP_K = 100
+
+
+def milliseconds(timings):
+    return {stage: round(seconds * 1000, 2) for stage, seconds in timings.items() if isinstance(seconds, float)}
+
+
+def create_app(pool_size=None):
+    """
+    Builds the Flask app around one warm copy of the search pipeline.
+
+    Importing hierarchical_semantic_search constructs the OpenAI client, the index
+    handle, the caches and the section tree once per process. Every request
+    reuses them, and with them the clients' pooled keep-alive connections. The
+    section tree and the BM25 index are re-read when an ingest saves them again.
+
+    Args:
+        pool_size: Keep-alive connections to Pinecone, overrides VECTOR_POOL_SIZE
+    """
+    import hierarchical_semantic_search as rag
+    from vector_store import open_index
+
+    if pool_size:
+        # Replace the handle opened at import, which only knows VECTOR_POOL_SIZE
+        rag.index = rag.retriever.index = open_index(rag.INDEX_NAME, pool_size=pool_size)
+
+    app = Flask(__name__)
+
+    @app.before_request
+    def reload_indexes():
+        # Pick up a re-ingest without restarting the service
+        rag.reload_indexes()
+
+    def read_question():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            body = {}
+        question = body.get("question")
+        question = question.strip() if isinstance(question, str) else ""
+        if not question:
+            return None, (jsonify(error="'question' is required"), 400)
+        try:
+            top_k = int(body.get("top_k", 5))
+        except (TypeError, ValueError):
+            top_k = None
+        if top_k is None or not 1 <= top_k <= MAX_TOP_K:
+            return None, (jsonify(error=f"'top_k' must be an integer from 1 to {MAX_TOP_K}"), 400)
+        # Checked before anything is embedded or queried
+        for key in ("section", "subsection"):
+            if not isinstance(body.get(key), (str, type(None))):
+                return None, (jsonify(error=f"'{key}' must be a string"), 400)
+        if body.get("expand") is not None and body.get("expand") not in EXPANSION_MODES:
+            return None, (jsonify(error=f"'expand' must be one of {', '.join(EXPANSION_MODES)}"), 400)
+        return {
+            "question": question,
+            "top_k": top_k,
+            "section": body.get("section"),
+            "subsection": body.get("subsection"),
+            "expand": body.get("expand"),
+            "stream": bool(body.get("stream")),
+        }, None
+
+    @app.route('/health')
+    def health():
+        return jsonify(status="ok")
+
+    @app.route('/search', methods=['POST'])
+    def search():
+        params, error = read_question()
+        if error:
+            return error
+
+        timings = {}
+        started = time.perf_counter()
+        mark = time.perf_counter()
+        rag.retriever.embed(params["question"])
+        timings["embed"] = time.perf_counter() - mark
+        mark = time.perf_counter()
+        results = rag.retriever.retrieve(params["question"], params["top_k"], params["section"], params["subsection"])
+        timings["query"] = time.perf_counter() - mark
+        timings["total"] = time.perf_counter() - started
+
+        matches = [
+            {
+                "id": match.id,
+                "score": match.score,
+                "section": match.metadata.get('Section', ''),
+                "subsection": match.metadata.get('Subsection', ''),
+                "text": match.metadata['text'],
+            }
+            for match in results['matches']
+        ]
+        return jsonify(matches=matches, timings=milliseconds(timings))
+
+    @app.route('/answer', methods=['POST'])
+    def answer():
+        params, error = read_question()
+        if error:
+            return error
+        options = {key: params[key] for key in ("top_k", "section", "subsection", "expand")}
+
+        if params["stream"]:
+            # Server-sent events: one event per token, then the timings once the answer is done
+            def generate():
+                stats = {}
+                for token in rag.stream_response(params["question"], stats=stats, **options):
+                    yield "data: " + json.dumps({"token": token}) + "\n\n"
+                yield "data: " + json.dumps({"done": True, "cached": stats.get("cached", False), "timings": milliseconds(stats)}) + "\n\n"
+
+            return Response(stream_with_context(generate()), content_type='text/event-stream')
+
+        timings = {}
+        text = rag.generate_response(params["question"], timings=timings, **options)
+        return jsonify(answer=text, timings=milliseconds(timings))
+
+    @app.route('/stats')
+    def stats():
+        return jsonify(
+            retriever=rag.retriever.stats(),
+            answer_cache=rag.answer_cache.stats(),
+            embedding_cache={"hits": rag.embedding_cache.hits, "misses": rag.embedding_cache.misses, "hit_rate": rag.embedding_cache.hit_rate},
+        )
+
+    app.config["rag"] = rag
+    return app
+
+
+def warm_up(rag):
+    # Open the connections before the first request rather than during it
+    for name, call in (("index", rag.index.describe_index_stats), ("OpenAI", rag.client.models.list)):
+        started = time.perf_counter()
+        try:
+            call()
+            print(f"Warmed up {name} connection in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"Could not warm up {name} connection: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve hierarchical search and answers over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pool-size", type=int, default=16, help="Keep-alive connections kept open to Pinecone")
+    parser.add_argument("--no-warm-up", action="store_true", help="Skip opening the upstream connections at startup")
+    args = parser.parse_args()
+
+    app = create_app(args.pool_size)
+    if not args.no_warm_up:
+        warm_up(app.config["rag"])
+
+    # HTTP/1.1 lets callers keep their connection to the service open too
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import time
+
+from bm25_index import reciprocal_rank_fusion
+from embedding_cache import normalize_text
+from ingestion import EMBEDDING_MODEL, embed_texts
+from lru_cache import TTLCache
+from manifest import DEFAULT_MANIFEST_DIR, manifest_directory, file_generation
+from mmr import mmr_rerank
+from section_tree import section_filter
+
+
+class Retriever:
+    """
+    Embeds a question once and queries the index once, caching both in process.
+
+    Question embeddings are kept in an LRU (backed by the persistent
+    EmbeddingCache when one is given). Query results are kept for `result_ttl`
+    seconds, so showing the matches and generating an answer for the same
+    question share a single retrieval.
+
+    With a lexical index the vector and BM25 results, `fetch_k` each, are merged
+    by reciprocal rank fusion, so the match scores are RRF scores.
+
+    With `mmr_lambda` set, `mmr_candidates` results are fetched with their vectors
+    and reranked by maximal marginal relevance for a less redundant top_k.
+
+    With `index_name` set, cached results are dropped whenever the namespace's
+    chunk manifest is written again, so a re-ingest is searched at once instead
+    of after `result_ttl`.
+    """
+
+    def __init__(self, client, index, namespace, embedding_cache=None, model=EMBEDDING_MODEL,
+                 max_embeddings=1024, max_results=256, result_ttl=300, lexical_index=None, fetch_k=20,
+                 mmr_lambda=None, mmr_candidates=100, index_name=None, backend=None,
+                 manifest_dir=DEFAULT_MANIFEST_DIR):
+        self.client = client
+        self.index = index
+        self.namespace = namespace
+        self.embedding_cache = embedding_cache
+        self.model = model
+        self.embeddings = TTLCache(max_embeddings)
+        self.results = TTLCache(max_results, result_ttl)
+        self.lexical_index = lexical_index
+        self.fetch_k = fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.mmr_candidates = mmr_candidates
+        self.manifest_path = None
+        if index_name is not None:
+            self.manifest_path = os.path.join(manifest_directory(index_name, backend, manifest_dir), f"{namespace}.json")
+        self._generation = file_generation(self.manifest_path) if self.manifest_path else None
+        # Running totals, the retriever lives as long as the service
+        self.mmr_calls = 0
+        self.mmr_seconds = 0.0
+        self.mmr_max_seconds = 0.0
+
+    def embed(self, question):
+        key = normalize_text(question)
+        embedding = self.embeddings.get(key)
+        if embedding is None:
+            embedding = embed_texts(self.client, [question], self.model, self.embedding_cache)[0]
+            self.embeddings.put(key, embedding)
+        return embedding
+
+    def query(self, embedding, top_k=5, section=None, subsection=None, include_values=False):
+        # Search Pinecone index, optionally only within one section subtree
+        return self.index.query(
+            namespace=self.namespace,
+            vector=embedding,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=include_values,
+            filter=section_filter(section, subsection) if section else None
+        )
+
+    def retrieve(self, question, top_k=5, section=None, subsection=None, include_values=False):
+        """
+        Returns the search results for a question, from cache when possible.
+
+        Args:
+            question: The question text
+            top_k: Number of matches
+            section: Optional section to restrict the search to
+            subsection: Optional subsection within that section
+            include_values: Also return the match vectors
+
+        Returns:
+            The index query response
+        """
+        self.refresh()
+        key = (normalize_text(question), top_k, section, subsection, include_values)
+        results = self.results.get(key)
+        if results is None:
+            if self.mmr_lambda is not None:
+                results = self.diversify(question, self.embed(question), top_k, section, subsection)
+            else:
+                results = self.search(question, self.embed(question), top_k, section, subsection, include_values)
+            self.results.put(key, results)
+        return results
+
+    def search(self, question, embedding, top_k=5, section=None, subsection=None, include_values=False):
+        # Hybrid when a lexical index was built for the namespace, vector only otherwise
+        if self.lexical_index is not None and len(self.lexical_index):
+            return self.hybrid_query(question, embedding, top_k, section, subsection, include_values)
+        return self.query(embedding, top_k, section, subsection, include_values)
+
+    def hybrid_query(self, question, embedding, top_k=5, section=None, subsection=None, include_values=False):
+        fetch_k = max(top_k, self.fetch_k)
+        vector_results = self.query(embedding, fetch_k, section, subsection, include_values)
+        lexical_results = self.lexical_index.query(
+            question, fetch_k, filter=section_filter(section, subsection) if section else None
+        )
+        return reciprocal_rank_fusion([vector_results, lexical_results], top_k)
+
+    def diversify(self, question, embedding, top_k=5, section=None, subsection=None):
+        candidates = self.search(question, embedding, max(top_k, self.mmr_candidates), section, subsection, include_values=True)
+        started = time.perf_counter()
+        # Lexical-only hits from hybrid search come without vectors
+        missing = [match.id for match in candidates['matches'] if not getattr(match, 'values', None)]
+        vectors = {}
+        if missing:
+            fetched = self.index.fetch(ids=missing, namespace=self.namespace)
+            vectors = {vector_id: vector['values'] for vector_id, vector in fetched['vectors'].items()}
+        results = mmr_rerank(candidates, embedding, top_k, self.mmr_lambda, vectors)
+        elapsed = time.perf_counter() - started
+        self.mmr_calls += 1
+        self.mmr_seconds += elapsed
+        self.mmr_max_seconds = max(self.mmr_max_seconds, elapsed)
+        return results
+
+    def refresh(self):
+        """
+        Drops cached results if the namespace was written to since the last call.
+
+        Returns:
+            bool: True if the manifest changed
+        """
+        if self.manifest_path is None:
+            return False
+        generation = file_generation(self.manifest_path)
+        if generation == self._generation:
+            return False
+        self._generation = generation
+        self.invalidate()
+        return True
+
+    def invalidate(self):
+        """Drops cached results, e.g. after the namespace was re-ingested."""
+        self.results.clear()
+
+    def stats(self):
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+    def report(self):
+        for name, stats in self.stats().items():
+            print(f"Retriever {name} cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+        if self.mmr_calls:
+            mean = self.mmr_seconds / self.mmr_calls
+            print(f"MMR rerank: {self.mmr_calls} calls, mean {mean * 1000:.2f}ms, max {self.mmr_max_seconds * 1000:.2f}ms")
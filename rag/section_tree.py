@@ -0,0 +1,176 @@
+import json
+import os
+
+from manifest import manifest_directory
+
+DEFAULT_TREE_DIR = ".section_trees"
+
+# Ways a search hit can be expanded, see SectionTree.expand
+EXPANSION_MODES = ("neighbors", "subsection", "section")
+
+
+class SectionTree:
+    """
+    Persisted map of document -> section -> subsection -> ordered chunk IDs.
+
+    Built at ingestion time from the Section/Subsection metadata written by
+    hierarchical_chunking.py. Chunk text is stored alongside, so a search hit can
+    be expanded to its neighbours or its whole subsection without another query.
+
+    Like the chunk manifests, trees are kept per backend and index, as they
+    describe what one index holds.
+
+    Args:
+        namespace: Index namespace the chunks are written to
+        index_name: Name of the index, as passed to open_index
+        backend: "pinecone" or "local", defaults to the VECTOR_BACKEND env variable
+        directory: Root directory of the trees
+    """
+
+    def __init__(self, namespace, index_name, backend=None, directory=DEFAULT_TREE_DIR):
+        self.namespace = namespace
+        self.path = os.path.join(manifest_directory(index_name, backend, directory), f"{namespace}.json")
+        self.documents = {}
+        self.chunks = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.documents = data["documents"]
+            self.chunks = data["chunks"]
+
+    def add_document(self, doc_id, records):
+        """
+        Replaces a document's part of the tree with the given records.
+
+        Args:
+            doc_id: Document the records belong to
+            records: Ordered (vector_id, text, metadata) tuples
+        """
+        self.remove_document(doc_id)
+        sections = []
+        for vector_id, text, metadata in records:
+            section = metadata.get("Section", "")
+            subsection = metadata.get("Subsection", "")
+            if not sections or sections[-1]["title"] != section:
+                sections.append({"title": section, "chunks": [], "subsections": []})
+            node = sections[-1]
+            if subsection:
+                if not node["subsections"] or node["subsections"][-1]["title"] != subsection:
+                    node["subsections"].append({"title": subsection, "chunks": []})
+                node["subsections"][-1]["chunks"].append(vector_id)
+            else:
+                node["chunks"].append(vector_id)
+            self.chunks[vector_id] = {
+                "doc": doc_id,
+                "text": text,
+                "section": section,
+                "subsection": subsection,
+            }
+        self.documents[doc_id] = sections
+
+    def remove_document(self, doc_id):
+        for section in self.documents.pop(doc_id, []):
+            for vector_id in self._section_chunks(section):
+                self.chunks.pop(vector_id, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"documents": self.documents, "chunks": self.chunks}, f)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _section_chunks(section):
+        ids = list(section["chunks"])
+        for subsection in section["subsections"]:
+            ids.extend(subsection["chunks"])
+        return ids
+
+    def _locate(self, vector_id):
+        # Returns the section node and the ordered chunk list the chunk sits in
+        chunk = self.chunks[vector_id]
+        for section in self.documents[chunk["doc"]]:
+            if section["title"] != chunk["section"]:
+                continue
+            if not chunk["subsection"]:
+                if vector_id in section["chunks"]:
+                    return section, section["chunks"]
+                continue
+            for subsection in section["subsections"]:
+                if subsection["title"] == chunk["subsection"] and vector_id in subsection["chunks"]:
+                    return section, subsection["chunks"]
+        raise KeyError(vector_id)
+
+    def neighbors(self, vector_id, window=1):
+        """The chunk and up to `window` chunks either side of it in the same subsection."""
+        _, siblings = self._locate(vector_id)
+        position = siblings.index(vector_id)
+        return siblings[max(0, position - window):position + window + 1]
+
+    def subsection(self, vector_id):
+        """All chunks of the chunk's subsection (or of its section body if it has no subsection)."""
+        return list(self._locate(vector_id)[1])
+
+    def section(self, vector_id):
+        """All chunks of the chunk's section, subsections included."""
+        return self._section_chunks(self._locate(vector_id)[0])
+
+    def text(self, vector_ids):
+        return "\n".join(self.chunks[vector_id]["text"] for vector_id in vector_ids)
+
+    def expand(self, matches, mode="neighbors", window=1):
+        """
+        Expands search matches into context blocks using the tree.
+
+        Overlapping expansions are merged into the block of the best scoring
+        match, so no chunk appears twice.
+
+        Args:
+            matches: Query matches, best first
+            mode: "neighbors", "subsection" or "section"
+            window: Neighbours either side of a hit for mode="neighbors"
+
+        Returns:
+            list: Dicts with ids, text, section, subsection and score, best first
+        """
+        blocks = []
+        used = set()
+        for match in matches:
+            if match.id not in self.chunks:
+                # Not in the tree (e.g. ingested before the tree existed), use the hit as is
+                ids = [match.id]
+                text = match.metadata["text"]
+                section = match.metadata.get("Section", "")
+                subsection = match.metadata.get("Subsection", "")
+            else:
+                if mode == "neighbors":
+                    ids = self.neighbors(match.id, window)
+                elif mode == "subsection":
+                    ids = self.subsection(match.id)
+                elif mode == "section":
+                    ids = self.section(match.id)
+                else:
+                    raise ValueError(f"Unknown expansion mode '{mode}'")
+                ids = [vector_id for vector_id in ids if vector_id not in used]
+                if not ids:
+                    continue
+                text = self.text(ids)
+                section = self.chunks[match.id]["section"]
+                subsection = self.chunks[match.id]["subsection"]
+            used.update(ids)
+            blocks.append({
+                "ids": ids,
+                "text": text,
+                "section": section,
+                "subsection": subsection,
+                "score": match.score,
+            })
+        return blocks
+
+
+def section_filter(section, subsection=None):
+    """Metadata filter restricting a query to one section subtree."""
+    if subsection is None:
+        return {"Section": {"$eq": section}}
+    return {"$and": [{"Section": {"$eq": section}}, {"Subsection": {"$eq": subsection}}]}
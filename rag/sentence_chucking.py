@@ -1,26 +1,72 @@
-from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import spacy
+from embedding_cache import EmbeddingCache
+from ingestion import chunk_records, ingest_chunks
+from manifest import ChunkManifest
+from vector_store import open_index
 
 # Load environment variables from the parent directory
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Load English language model
-nlp = spacy.load("en_core_web_sm")
+# English language models, loaded on first use
+_models = {}
+
+def build_sentence_model(mode="full"):
+    """
+    Builds a spaCy pipeline that can split text into sentences.
+
+    Args:
+        mode: "full" loads all of en_core_web_sm (tagger, parser, NER, ...),
+            "senter" keeps only its statistical sentence recognizer and
+            "sentencizer" uses spaCy's rule-based splitter without a model
+
+    Returns:
+        spacy.Language: The pipeline
+    """
+    if mode == "full":
+        return spacy.load("en_core_web_sm")
+    if mode == "senter":
+        nlp = spacy.load("en_core_web_sm", exclude=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"])
+        nlp.enable_pipe("senter")
+        return nlp
+    if mode == "sentencizer":
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        return nlp
+    raise ValueError(f"Unknown sentence model mode '{mode}'")
+
+def load_sentence_model(mode="full"):
+    if mode not in _models:
+        _models[mode] = build_sentence_model(mode)
+    return _models[mode]
+
+def group_sentences(doc, sentences_per_chunk=5):
+    sentences = [sent.text.strip() for sent in doc.sents]
+    return [" ".join(sentences[i:i + sentences_per_chunk]) for i in range(0, len(sentences), sentences_per_chunk)]
 
 def sentence_based_chunking(text, sentences_per_chunk=5):
-    doc = nlp(text)
-    sentences = [sent.text.strip() for sent in doc.sents]
-    chunks = [" ".join(sentences[i:i + sentences_per_chunk]) for i in range(0, len(sentences), sentences_per_chunk)]
-    return chunks
+    doc = load_sentence_model("full")(text)
+    return group_sentences(doc, sentences_per_chunk)
+
+def sentence_based_chunking_batch(texts, sentences_per_chunk=5, mode="senter", n_process=1, batch_size=64):
+    """
+    Chunks many documents at once by streaming them through nlp.pipe.
+
+    Args:
+        texts: Iterable of document strings
+        sentences_per_chunk: Sentences joined into each chunk
+        mode: Sentence model mode, see build_sentence_model
+        n_process: Worker processes used by nlp.pipe
+        batch_size: Documents per batch sent to each worker
+
+    Returns:
+        generator: A list of chunks per document, in input order
+    """
+    nlp = load_sentence_model(mode)
+    for doc in nlp.pipe(texts, n_process=n_process, batch_size=batch_size):
+        yield group_sentences(doc, sentences_per_chunk)
 
 # Example text
 text = """
@@ -88,21 +134,18 @@ Measuring the success of a digital transformation initiative involves setting ke
 Digital transformation is a journey, not a destination. Organizations that succeed in digital transformation continuously evolve their strategies, adapt to changing technologies, and place a strong emphasis on data management and employee engagement. By following a structured framework and embracing a culture of innovation, companies can position themselves for long-term success in a digital-first world.
 """
 
-index = pc.Index('insert_your_index_name_here')  # Ensure you put in the name of the index that you created in pinecone here
-print("Assigned Pinecone index 'insert_your_index_name_here'")
+if __name__ == "__main__":
+    # Initialize the OpenAI client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    index_name = 'insert_your_index_name_here'  # Ensure you put in the name of the index that you created in pinecone here
+    index = open_index(index_name)
+    print(f"Assigned index '{index_name}'")
 
-# Generate and store chunks
-print("Starting to process and store text chunks...")
-for i, chunk in enumerate(sentence_based_chunking(text)):
-    print(f"Processing chunk {i+1}...")
-    response = client.embeddings.create(input=chunk, model="text-embedding-3-small")
-    embedding = response.data[0].embedding
-    print(f"Generated embedding for chunk {i+1}")
+    # Generate and store chunks
+    print("Starting to process and store text chunks...")
+    ingest_chunks(client, index, chunk_records(sentence_based_chunking(text)), namespace="sentence_chunking",
+                  cache=EmbeddingCache(), manifest=ChunkManifest("sentence_chunking", index_name))
 
-    index.upsert(
-        vectors=[(f"document_1_chunk_{i}", embedding, {"text": chunk})],
-        namespace="sentence_chunking"
-    )
-    print(f"Stored chunk {i+1} in Pinecone index")
+    print("Finished processing and storing all chunks")
 
-print("Finished processing and storing all chunks")
\ No newline at end of file
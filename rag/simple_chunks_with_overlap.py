@@ -1,23 +1,67 @@
-from pinecone import Pinecone
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import sys
+from embedding_cache import EmbeddingCache
+from ingestion import chunk_records, ingest_chunks
+from manifest import ChunkManifest
+from vector_store import open_index
 
 # Load environment variables from the parent directory
 load_dotenv()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-# Initialize the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def fixed_length_chunking(text, chunk_size=500, overlap=50):
     chunks = []
     for i in range(0, len(text), chunk_size - overlap):
         chunks.append(text[i:i + chunk_size])
     return chunks
 
+def iter_fixed_length_chunks(stream, chunk_size=500, overlap=50):
+    """
+    Lazily yields the same chunks as fixed_length_chunking from a text stream.
+
+    Only the current window is held in memory; the overlap is carried over
+    from one window to the next instead of re-slicing the whole text.
+
+    Args:
+        stream: Text stream with a read(n) method, e.g. an open text file
+        chunk_size: Characters per chunk
+        overlap: Characters shared between consecutive chunks
+
+    Returns:
+        generator: Chunk strings
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be at least 0 and smaller than chunk_size")
+
+    step = chunk_size - overlap
+    window = stream.read(chunk_size)
+    while window:
+        yield window
+        carry = window[step:]
+        window = carry + stream.read(chunk_size - len(carry))
+
+def stream_fixed_length_chunks(path, chunk_size=500, overlap=50, encoding="utf-8", buffer_size=1 << 20):
+    """
+    Streams fixed length chunks from a file of any size with flat memory use.
+
+    The file is read through a buffered incremental decoder, so multi-byte
+    UTF-8 characters are never split across read boundaries.
+
+    Args:
+        path: Path to the text file
+        chunk_size: Characters per chunk
+        overlap: Characters shared between consecutive chunks
+        encoding: File encoding
+        buffer_size: Size of the underlying read buffer in bytes
+
+    Returns:
+        generator: Chunk strings
+    """
+    # newline="" keeps line endings exactly as they are in the file
+    with open(path, encoding=encoding, newline="", buffering=buffer_size) as f:
+        yield from iter_fixed_length_chunks(f, chunk_size, overlap)
+
 # Example text
 text = """
 **Sample Text:**
@@ -84,21 +128,23 @@ Measuring the success of a digital transformation initiative involves setting ke
 Digital transformation is a journey, not a destination. Organizations that succeed in digital transformation continuously evolve their strategies, adapt to changing technologies, and place a strong emphasis on data management and employee engagement. By following a structured framework and embracing a culture of innovation, companies can position themselves for long-term success in a digital-first world.
 """
 
-index = pc.Index('insert_your_index_name_here')  # Ensure you put in the name of the index that you created in pinecone here
-print("Assigned Pinecone index 'insert_your_index_name_here'")
+if __name__ == "__main__":
+    # Initialize the OpenAI client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    index_name = 'insert_your_index_name_here'  # Ensure you put in the name of the index that you created in pinecone here
+    index = open_index(index_name)
+    print(f"Assigned index '{index_name}'")
 
-# Generate and store chunks
-print("Starting to process and store text chunks...")
-for i, chunk in enumerate(fixed_length_chunking(text)):
-    print(f"Processing chunk {i+1}...")
-    response = client.embeddings.create(input=chunk, model="text-embedding-3-small")
-    embedding = response.data[0].embedding
-    print(f"Generated embedding for chunk {i+1}")
+    # Stream chunks from a file if one is given, otherwise use the example text
+    if len(sys.argv) > 1:
+        chunks = stream_fixed_length_chunks(sys.argv[1])
+    else:
+        chunks = fixed_length_chunking(text)
 
-    index.upsert(
-        vectors=[(f"document_1_chunk_{i}", embedding, {"text": chunk})],
-        namespace="simple_chunking_with_overlap"
-    )
-    print(f"Stored chunk {i+1} in Pinecone index")
+    # Generate and store chunks
+    print("Starting to process and store text chunks...")
+    ingest_chunks(client, index, chunk_records(chunks), namespace="simple_chunking_with_overlap",
+                  cache=EmbeddingCache(), manifest=ChunkManifest("simple_chunking_with_overlap", index_name))
 
-print("Finished processing and storing all chunks")
\ No newline at end of file
+    print("Finished processing and storing all chunks")
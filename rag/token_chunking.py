@@ -0,0 +1,188 @@
+from openai import OpenAI
+from dotenv import load_dotenv
+import os
+import re
+import sys
+import tiktoken
+from bm25_index import BM25Index
+from embedding_cache import EmbeddingCache
+from hierarchical_chunking import block_records, process_markdown, text
+from ingestion import ingest_chunks
+from manifest import ChunkManifest
+from section_tree import SectionTree
+from vector_store import open_index
+
+# Load environment variables from the parent directory
+load_dotenv()
+
+# text-embedding-3-small uses the cl100k_base tokenizer
+encoding = tiktoken.get_encoding("cl100k_base")
+
+# Hard input limit of the embedding model
+MAX_EMBEDDING_TOKENS = 8191
+
+
+def count_tokens(text):
+    return len(encoding.encode(text))
+
+
+def split_sentences(paragraph):
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()) if sentence]
+
+
+def split_long_unit(unit, target_tokens, overlap_tokens):
+    # A single sentence longer than the target is cut on token boundaries.
+    # Tokens are byte sequences, so a cut can fall inside a multi-byte character
+    # and decode to U+FFFD: cuts are only made where a token starts a character.
+    tokens = encoding.encode(unit)
+    data = encoding.decode_bytes(tokens)
+    starts_character = []
+    offset = 0
+    for token in tokens:
+        # UTF-8 continuation bytes look like 0b10xxxxxx
+        starts_character.append(data[offset] & 0xC0 != 0x80)
+        offset += len(encoding.decode_single_token_bytes(token))
+    starts_character.append(True)
+
+    step = max(target_tokens - overlap_tokens, 1)
+    pieces = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + target_tokens, len(tokens))
+        while end > start + 1 and not starts_character[end]:
+            end -= 1
+        # A single character longer than the target stays whole
+        while not starts_character[end]:
+            end += 1
+        pieces.append(encoding.decode(tokens[start:end]))
+        if end == len(tokens):
+            break
+        # Never past the cut, or the text between them would be lost
+        start = min(start + step, end)
+        while not starts_character[start]:
+            start += 1
+    return pieces
+
+
+def pack_units(units, target_tokens, overlap_tokens):
+    """
+    Greedily packs (text, token_count) units into chunks of up to target_tokens.
+
+    Each new chunk starts with the trailing units of the previous one, as long
+    as they fit in overlap_tokens.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for unit, tokens in units:
+        if current and current_tokens + tokens > target_tokens:
+            chunks.append(current)
+            overlap = []
+            overlap_size = 0
+            for previous, previous_tokens in reversed(current):
+                if overlap_size + previous_tokens > overlap_tokens or overlap_size + previous_tokens + tokens > target_tokens:
+                    break
+                overlap.insert(0, (previous, previous_tokens))
+                overlap_size += previous_tokens
+            current = overlap
+            current_tokens = overlap_size
+        current.append((unit, tokens))
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def token_based_chunking(content_blocks, target_tokens=256, overlap_tokens=32):
+    """
+    Packs the blocks from process_markdown into chunks of roughly target_tokens.
+
+    Blocks are only packed together within the same section and subsection, so
+    every chunk keeps the metadata of the blocks it was built from.
+
+    Args:
+        content_blocks: Output of process_markdown
+        target_tokens: Maximum tokens per chunk
+        overlap_tokens: Maximum tokens repeated from the end of the previous chunk
+
+    Returns:
+        list: Dicts with content, section, subsection and token_count
+    """
+    if not 0 <= overlap_tokens < target_tokens <= MAX_EMBEDDING_TOKENS:
+        raise ValueError("Expected 0 <= overlap_tokens < target_tokens <= MAX_EMBEDDING_TOKENS")
+
+    # Group consecutive blocks that share a section and subsection
+    groups = []
+    for block in content_blocks:
+        key = (block["section"], block["subsection"])
+        if not groups or groups[-1][0] != key:
+            groups.append((key, []))
+        groups[-1][1].append(block["content"])
+
+    chunks = []
+    for (section, subsection), paragraphs in groups:
+        units = []
+        for paragraph in paragraphs:
+            for sentence in split_sentences(paragraph):
+                tokens = count_tokens(sentence)
+                if tokens > target_tokens:
+                    units.extend((piece, count_tokens(piece)) for piece in split_long_unit(sentence, target_tokens, overlap_tokens))
+                else:
+                    units.append((sentence, tokens))
+
+        for packed in pack_units(units, target_tokens, overlap_tokens):
+            content = " ".join(unit for unit, _ in packed)
+            chunks.append({
+                "content": content,
+                "section": section,
+                "subsection": subsection,
+                "token_count": count_tokens(content),
+            })
+    return chunks
+
+
+def report_token_stats(chunks):
+    counts = sorted(chunk["token_count"] for chunk in chunks)
+    if not counts:
+        print("No chunks produced")
+        return
+    print(
+        f"{len(counts)} chunks, {sum(counts)} tokens total: "
+        f"min {counts[0]}, mean {sum(counts) / len(counts):.0f}, "
+        f"p50 {counts[len(counts) // 2]}, p95 {counts[min(len(counts) - 1, int(len(counts) * 0.95))]}, "
+        f"max {counts[-1]}"
+    )
+
+
+if __name__ == "__main__":
+    target_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    overlap_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    # Initialize the OpenAI client
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    index_name = 'insert_your_index_name_here'  # Ensure you put in the name of the index that you created in pinecone here
+    index = open_index(index_name)
+    print(f"Assigned index '{index_name}'")
+
+    chunks = token_based_chunking(process_markdown(text), target_tokens, overlap_tokens)
+    report_token_stats(chunks)
+    records = list(block_records(chunks))
+
+    # Generate and store chunks
+    print("Starting to process and store text chunks...")
+    ingest_chunks(client, index, records, namespace="token_chunking",
+                  cache=EmbeddingCache(), manifest=ChunkManifest("token_chunking", index_name))
+
+    tree = SectionTree("token_chunking", index_name)
+    tree.add_document("document_1", records)
+    tree.save()
+
+    # Lexical index over the same chunk IDs for hybrid search
+    lexical_index = BM25Index("token_chunking", index_name)
+    lexical_index.add_document("document_1", records)
+    lexical_index.save()
+
+    print("Finished processing and storing all chunks")
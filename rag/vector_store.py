@@ -0,0 +1,47 @@
+import os
+
+
+def open_index(index_name, backend=None, pool_size=None):
+    """
+    Opens the vector index the RAG scripts read from and write to.
+
+    Args:
+        index_name: Name of the Pinecone index
+        backend: "pinecone" or "local", defaults to the VECTOR_BACKEND env variable
+        pool_size: Keep-alive connections to Pinecone, for callers querying from
+            many threads. Defaults to the VECTOR_POOL_SIZE env variable, or the
+            client's own default
+
+    Returns:
+        A Pinecone index or a LocalIndex, both support upsert/query/fetch/delete
+    """
+    # Read at call time so values from a .env loaded after import are picked up
+    backend = backend or os.getenv("VECTOR_BACKEND", "pinecone")
+    if backend == "local":
+        from local_index import LocalIndex
+
+        return LocalIndex(
+            os.path.join(os.getenv("LOCAL_INDEX_PATH", ".local_index"), index_name),
+            dtype=os.getenv("LOCAL_INDEX_DTYPE", "float32"),
+            graph_threshold=int(os.getenv("LOCAL_INDEX_GRAPH_THRESHOLD", "0")) or None,
+            quantization=os.getenv("LOCAL_INDEX_QUANTIZATION") or None,
+        )
+    if backend == "pinecone":
+        from pinecone import Pinecone
+
+        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        pool_size = pool_size or int(os.getenv("VECTOR_POOL_SIZE", "0"))
+        if pool_size:
+            return pc.Index(index_name, pool_threads=pool_size, connection_pool_maxsize=pool_size)
+        return pc.Index(index_name)
+    raise ValueError(f"Unknown vector backend '{backend}', expected 'pinecone' or 'local'")
+
+
+def flush_index(index):
+    """
+    Compacts what a bulk write left in a LocalIndex's record logs. Pinecone
+    indexes have nothing to flush.
+    """
+    flush = getattr(index, "flush", None)
+    if flush is not None:
+        flush()